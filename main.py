@@ -4,7 +4,8 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.simulation import run_many
-from src.config import SESSION_DURATION
+from src.config import SESSION_DURATION, RULE_TYPE
+from src.rules import RULES, get_rule
 
 def get_input(prompt, default_value, value_type=str):
     user_input = input(f"{prompt} [Default: {default_value}]: ").strip()
@@ -25,7 +26,12 @@ def main():
     print("Please configure the simulation parameters:\n")
 
     spot_level = get_input("Select Spot Level (beginner/mixed/advanced)", "beginner")
-    rule_type = get_input("Select Rule Type (free-for-all/safe-distance-rule)", "free-for-all")
+    rule_type = get_input(f"Select Rule Type ({'/'.join(RULES)})", RULE_TYPE)
+    try:
+        get_rule(rule_type)
+    except ValueError as e:
+        print(f"{e}. Using default value: {RULE_TYPE}")
+        rule_type = RULE_TYPE
     num_surfer = get_input("Number of Surfaces (Enter 0 for realistic auto-count)", 0, int)
     if num_surfer == 0:
         num_surfer = None
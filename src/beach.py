@@ -0,0 +1,474 @@
+"""
+Whole-beach simulation with several peaks and a dynamic crowd.
+
+Unlike run_simulation, which follows one fixed lineup of Surfer objects, run_beach keeps
+every surfer in a fixed-capacity SurferPool of numpy arrays. Surfers arrive by a Poisson
+process, paddle out to one of the BEACH_CONF peaks, and leave after an exponential session
+length once they are back in the lineup. Catch checks sort waiting surfers by x and collision
+checks hash positions into a grid, so a tick costs O(n log n) in the number of surfers.
+
+The per-surfer behaviour follows Surfer (same probability models and state cycle), except
+that surfers are updated together: the surfers going for one wave draw their attempts at
+once, and collisions are checked against positions after every rider has moved. Those who
+stood up on the same wave are then resolved in x order, so a rule such as safe_distance
+still sees surfers who caught the wave earlier in the tick (see Rule.yields).
+"""
+import pandas as pd
+
+from src.simulation import *
+from src.rules import get_rule, permitted_pairs
+
+# State codes of the pool (indices into STATES)
+WAITING, PADDLING, SURFING, WIPEOUT = range(4)
+STATES = ['waiting', 'paddling', 'surfing', 'wipeout']
+NO_WAVE = -1
+
+# Grid hashing offsets for collision checks (cells are addressed by two 21-bit indices)
+CELL_OFFSET = 2 ** 20
+CELL_STRIDE = 2 ** 21
+
+class SurferPool:
+    """
+    Fixed-capacity, array-backed storage of surfers.
+
+    Slots are recycled through a free-slot stack, so arrivals and departures never
+    reallocate the arrays. Every per-surfer attribute is an array indexed by slot.
+
+    Attributes:
+        capacity (int): Number of slots.
+        active (ndarray): Whether each slot currently holds a surfer.
+        state (ndarray): State code of each surfer (WAITING, PADDLING, SURFING, WIPEOUT).
+        wave_id (ndarray): Id of the wave a surfer is riding or wiping out on, NO_WAVE otherwise.
+        success, collisions, wipeouts (ndarray): Per-surfer event counters.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.active = np.zeros(capacity, dtype=bool)
+
+        self.skill = np.zeros(capacity)
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.bp = np.zeros(capacity)
+        self.peak = np.zeros(capacity, dtype=np.int64)
+        self.leave_time = np.zeros(capacity)
+        self.state = np.zeros(capacity, dtype=np.int8)
+
+        self.wave_id = np.full(capacity, NO_WAVE, dtype=np.int64)
+        self.wave_height = np.zeros(capacity)
+        self.wave_speed = np.zeros(capacity)
+        self.distance_on_wave = np.zeros(capacity)
+        self.ride_counted = np.zeros(capacity, dtype=bool)
+
+        self.last_catch_time = np.full(capacity, np.nan)
+        self.waiting_time_sum = np.zeros(capacity)
+        self.success = np.zeros(capacity, dtype=np.int64)
+        self.collisions = np.zeros(capacity, dtype=np.int64)
+        self.wipeouts = np.zeros(capacity, dtype=np.int64)
+
+        self._free = np.arange(capacity)[::-1].copy()
+        self._n_free = capacity
+
+    def __len__(self):
+        return self.capacity - self._n_free
+
+    def acquire(self, n):
+        """
+        Take up to n free slots and reset their per-surfer state.
+
+        :param n: number of slots requested
+        :return: array of slot indices (shorter than n if the pool is full)
+        >>> pool = SurferPool(3)
+        >>> pool.acquire(2).tolist(), len(pool)
+        ([0, 1], 2)
+        >>> pool.acquire(5).tolist()
+        [2]
+        """
+        n = min(n, self._n_free)
+        slots = self._free[self._n_free - n:self._n_free][::-1].copy()
+        self._n_free -= n
+
+        self.active[slots] = True
+        self.wave_id[slots] = NO_WAVE
+        self.distance_on_wave[slots] = 0
+        self.ride_counted[slots] = False
+        self.last_catch_time[slots] = np.nan
+        self.waiting_time_sum[slots] = 0
+        self.success[slots] = 0
+        self.collisions[slots] = 0
+        self.wipeouts[slots] = 0
+        return slots
+
+    def release(self, slots):
+        """
+        Return slots to the pool.
+
+        :param slots: array of slot indices to free
+        >>> pool = SurferPool(2)
+        >>> pool.release(pool.acquire(2))
+        >>> len(pool), pool.acquire(1).tolist()
+        (0, [1])
+        """
+        self.active[slots] = False
+        self._free[self._n_free:self._n_free + len(slots)] = slots
+        self._n_free += len(slots)
+
+    def land(self, slots):
+        """Send surfers that reached the shore back to paddling and clear their ride."""
+        self.state[slots] = PADDLING
+        self.distance_on_wave[slots] = 0
+        self.wave_id[slots] = NO_WAVE
+        self.ride_counted[slots] = False
+
+def neighbor_pairs(qx, qy, px, py, radius):
+    """
+    Find all (query, point) index pairs closer than radius using a uniform grid.
+
+    Points are hashed into square cells of side radius and sorted by cell; each query
+    only scans its 3 x 3 neighbouring cells, so the cost grows with the number of close
+    pairs rather than with len(qx) * len(px).
+
+    :param qx: x-coordinates of the query points
+    :param qy: y-coordinates of the query points
+    :param px: x-coordinates of the searched points
+    :param py: y-coordinates of the searched points
+    :param radius: pair distance threshold (exclusive)
+    :return: tuple of index arrays (query_index, point_index)
+    >>> q, p = neighbor_pairs(np.array([0.0]), np.array([0.0]), np.array([1.0, 5.0, -2.0]), np.array([0.0, 0.0, 2.5]), 3)
+    >>> sorted(p.tolist())
+    [0]
+    """
+    def cell_key(x, y):
+        cx = np.floor(x / radius).astype(np.int64) + CELL_OFFSET
+        cy = np.floor(y / radius).astype(np.int64) + CELL_OFFSET
+        return cx * CELL_STRIDE + cy
+
+    order = np.argsort(cell_key(px, py), kind="stable")
+    sorted_keys = cell_key(px, py)[order]
+    q_key = cell_key(qx, qy)
+
+    q_parts, p_parts = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            key = q_key + dx * CELL_STRIDE + dy
+            lo = np.searchsorted(sorted_keys, key, side="left")
+            hi = np.searchsorted(sorted_keys, key, side="right")
+            counts = hi - lo
+            total = counts.sum()
+            if total == 0:
+                continue
+            q_idx = np.repeat(np.arange(len(qx)), counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            q_parts.append(q_idx)
+            p_parts.append(order[np.repeat(lo, counts) + offsets])
+
+    if not q_parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    q_idx = np.concatenate(q_parts)
+    p_idx = np.concatenate(p_parts)
+    close = (qx[q_idx] - px[p_idx]) ** 2 + (qy[q_idx] - py[p_idx]) ** 2 < radius ** 2
+    return q_idx[close], p_idx[close]
+
+def find_collisions(pool, riders, threshold=3):
+    """
+    Vectorized Surfer.check_collisions for a set of riders.
+
+    A rider collides with any other surfer closer than threshold who is either not on a
+    wave or on the same wave.
+
+    :param pool: the SurferPool
+    :param riders: slots of the riders to check
+    :param threshold: collision distance in meters
+    :return: boolean array, True for riders that collide
+    >>> pool = SurferPool(3)
+    >>> slots = pool.acquire(3)
+    >>> pool.x[:] = [10.0, 11.0, 30.0]
+    >>> pool.wave_id[:] = [0, NO_WAVE, 0]
+    >>> find_collisions(pool, np.array([0, 2])).tolist()
+    [True, False]
+    """
+    others = np.flatnonzero(pool.active)
+    q_idx, p_idx = neighbor_pairs(pool.x[riders], pool.y[riders], pool.x[others], pool.y[others], threshold)
+
+    rider_slots = riders[q_idx]
+    other_slots = others[p_idx]
+    other_wave = pool.wave_id[other_slots]
+    valid = (rider_slots != other_slots) & ((other_wave == NO_WAVE) | (other_wave == pool.wave_id[rider_slots]))
+
+    collided = np.zeros(len(riders), dtype=bool)
+    collided[q_idx[valid]] = True
+    return collided
+
+def place_surfers(pool, n, t, spot_conf, beach_conf, rng, at_shore=True):
+    """
+    Add n surfers to the pool at randomly chosen peaks.
+
+    :param pool: the SurferPool
+    :param n: number of surfers to add
+    :param t: current time (sec)
+    :param spot_conf: spot configuration (skill distribution)
+    :param beach_conf: beach configuration (peaks, session length)
+    :param rng: random stream
+    :param at_shore: arrivals start paddling from the shore; otherwise surfers are scattered
+        around their lineup like Surfer.initial_x
+    :return: tuple (slots added, peak index of every surfer that was turned away)
+    """
+    peaks = beach_conf["peaks"]
+    weights = np.array([p["weight"] for p in peaks], dtype=float)
+    peak = rng.choice(len(peaks), size=n, p=weights / weights.sum())
+
+    slots = pool.acquire(n)
+    turned_away = peak[len(slots):]
+    peak = peak[:len(slots)]
+    n = len(slots)
+
+    y_center = np.array([p["y"] for p in peaks], dtype=float)[peak]
+    width = np.array([p["width"] for p in peaks], dtype=float)[peak]
+    shift = np.array([p["bp_shift"] for p in peaks], dtype=float)[peak]
+
+    skill = rng.beta(spot_conf["skill"]["alpha"], spot_conf["skill"]["beta"], size=n)
+    pool.skill[slots] = skill
+    pool.peak[slots] = peak
+    pool.y[slots] = np.clip(y_center + rng.uniform(-0.5, 0.5, size=n) * width, beach_conf["y_min"], beach_conf["y_max"])
+    pool.speed[slots] = Surfer.PADDLE_SPEED_BASE + skill * Surfer.PADDLE_SPEED_SKILL_COEFF
+    pool.bp[slots] = BP_X_MIN + skill * (BP_X_MAX - BP_X_MIN) + shift
+    pool.leave_time[slots] = t + rng.exponential(beach_conf["mean_stay"], size=n)
+
+    if at_shore:
+        pool.x[slots] = 0
+        pool.state[slots] = PADDLING
+    else:
+        loc = np.interp(skill, [0, 1], [LINEUP_X_NEAR_SHORE, LINEUP_X_OUTSIDE]) + shift
+        pool.x[slots] = np.maximum(0, rng.normal(loc=loc, scale=5))
+        pool.state[slots] = np.where(np.abs(pool.x[slots] - pool.bp[slots]) <= CATCH_WAVE_THRESHOLD, WAITING, PADDLING)
+
+    return slots, turned_away
+
+def catch_waves(pool, waiting, waves, occupied, rule_type, rng, alpha_success, peak_y=None):
+    """
+    Let waiting surfers attempt the waves passing their position (vectorized update_waiting_state).
+
+    :param pool: the SurferPool
+    :param waiting: slots of the waiting surfers
+    :param waves: dictionary of active wave arrays ('id', 'x', 'height', 'speed'), in spawn order
+    :param occupied: dictionary mapping wave id to the list of (y, peak) of the surfers who caught it
+    :param rule_type: the lineup rule (a name registered in src.rules.RULES, or a Rule)
+    :param rng: random stream
+    :param alpha_success: impact of wave height on success probability
+    :param peak_y: y-coordinate of every peak (default: PEAK_Y for all)
+    :return: None
+    """
+    rule = get_rule(rule_type)
+    if len(waiting) == 0 or len(waves["id"]) == 0:
+        return
+
+    riders = [(k, y, peak) for k, wave_id in enumerate(waves["id"].tolist()) for y, peak in occupied.get(wave_id, ())]
+    rider_wave, rider_y, rider_peak = (np.array(column) for column in zip(*riders)) if riders else (np.zeros(0),) * 3
+    peak = pool.peak[waiting]
+    surfer, wave = permitted_pairs(
+        rule,
+        x=pool.x[waiting],
+        y=pool.y[waiting],
+        wave_x=waves["x"],
+        rider_wave=rider_wave,
+        rider_y=rider_y,
+        peak=peak,
+        peak_y=None if peak_y is None else np.asarray(peak_y, dtype=float)[peak],
+        queue_time=pool.last_catch_time[waiting],
+        rider_peak=rider_peak,
+    )
+    taken = np.zeros(len(waiting), dtype=bool)
+
+    # permitted pairs come grouped by wave (in spawn order), each group sorted by x
+    bounds = np.searchsorted(wave, np.arange(len(waves["id"]) + 1))
+    for k in np.flatnonzero(np.diff(bounds)):
+        positions = surfer[bounds[k]:bounds[k + 1]]
+        positions = positions[~taken[positions]]
+        slots = waiting[positions]
+
+        wave_id = int(waves["id"][k])
+        height = waves["height"][k]
+        attempt = rng.rand(len(slots)) < attempt_probability(pool.skill[slots], height)
+        stood_up = attempt & (rng.rand(len(slots)) < success_probability(pool.skill[slots], height, alpha_success))
+
+        # surfers who stood up take the wave one after another; the rule may turn back later ones
+        riders_y = [y for y, _ in occupied.get(wave_id, ())]
+        for j in np.flatnonzero(stood_up):
+            if rule.yields(pool.y[slots[j]], riders_y):
+                stood_up[j] = False
+            else:
+                riders_y.append(pool.y[slots[j]])
+
+        slots = slots[stood_up]
+        taken[positions[stood_up]] = True
+        pool.state[slots] = SURFING
+        pool.wave_id[slots] = wave_id
+        pool.wave_height[slots] = height
+        pool.wave_speed[slots] = waves["speed"][k]
+        pool.distance_on_wave[slots] = 0
+        pool.ride_counted[slots] = False
+        occupied.setdefault(wave_id, []).extend(zip(pool.y[slots].tolist(), pool.peak[slots].tolist()))
+
+def ride_waves(pool, riders, t, rng):
+    """
+    Move riders with their wave and resolve landing, collisions, wipeouts and successful rides
+    (vectorized update_surfing_state).
+
+    :param pool: the SurferPool
+    :param riders: slots of the surfers riding at the start of the tick
+    :param t: current time (sec)
+    :param rng: random stream
+    :return: None
+    """
+    pool.x[riders] -= pool.wave_speed[riders]
+    pool.distance_on_wave[riders] += pool.wave_speed[riders]
+
+    ashore = pool.x[riders] <= 0
+    pool.land(riders[ashore])
+    riders = riders[~ashore]
+
+    collided = find_collisions(pool, riders)
+    pool.collisions[riders[collided]] += 1
+    pool.state[riders[collided]] = WIPEOUT
+    riders = riders[~collided]
+
+    wiped = rng.rand(len(riders)) < wipeout_probability(pool.skill[riders], pool.wave_height[riders])
+    pool.wipeouts[riders[wiped]] += 1
+    pool.state[riders[wiped]] = WIPEOUT
+    riders = riders[~wiped]
+
+    counted = riders[(pool.distance_on_wave[riders] >= SUCCESS_DISTANCE) & ~pool.ride_counted[riders]]
+    pool.success[counted] += 1
+    pool.ride_counted[counted] = True
+    last = pool.last_catch_time[counted]
+    pool.waiting_time_sum[counted] += np.where(np.isnan(last), 0, t - last)
+    pool.last_catch_time[counted] = t
+
+def run_beach(
+        spot_level=SPOT_LEVEL,
+        rule_type=RULE_TYPE,
+        spot_conf=None,
+        beach_conf=None,
+        wave_schedule=None,
+        duration=SESSION_DURATION,
+        initial_surfers=None,
+        seed=None,
+):
+    """
+    Runs a whole-beach session with several peaks and surfers arriving and leaving.
+
+    :param spot_level: the difficulty level of the spot (skill and wave distributions)
+    :param rule_type: the lineup rule surfers follow (a name registered in src.rules.RULES)
+    :param spot_conf: custom spot configuration dictionary
+    :param beach_conf: custom beach configuration (defaults to BEACH_CONF)
+    :param wave_schedule: a list of wave configurations (waves span the whole beach)
+    :param duration: duration of the simulation in seconds
+    :param initial_surfers: surfers in the water at t = 0 (defaults to the steady-state
+        crowd arrival_rate * mean_stay)
+    :param seed: seed of the session
+    :return: DataFrame of compute_stats metrics, one row per peak plus a 'beach' row
+    >>> table = run_beach(duration=60, initial_surfers=200, seed=1)
+    >>> table.index.tolist()
+    ['peak_0', 'peak_1', 'peak_2', 'peak_3', 'peak_4', 'beach']
+    >>> int(table.loc["beach", "n_surfers"]) == int(table["n_surfers"].iloc[:-1].sum())
+    True
+    """
+    if spot_conf is None:
+        spot_conf = SPOT_CONF[spot_level]
+    if beach_conf is None:
+        beach_conf = BEACH_CONF
+    if initial_surfers is None:
+        initial_surfers = int(round(beach_conf["arrival_rate"] * beach_conf["mean_stay"]))
+
+    rule = get_rule(rule_type)
+    rng = np.random if seed is None else make_streams(seed, 1)[0]
+    alpha_success = spot_conf.get("alpha_success", ALPHA_SUCCESS)
+
+    if wave_schedule is None:
+        wave_schedule = simulate_waves(duration, spot_conf, rng=rng)
+    schedule = sorted(wave_schedule, key=lambda w: w['spawn_time'])
+    spawn_time = np.array([w['spawn_time'] for w in schedule], dtype=float)
+    next_wave = 0
+
+    n_peaks = len(beach_conf["peaks"])
+    peak_y = [p["y"] for p in beach_conf["peaks"]]
+    pool = SurferPool(beach_conf["capacity"])
+    waves = {"id": np.zeros(0, dtype=np.int64), "x": np.zeros(0), "height": np.zeros(0), "speed": np.zeros(0)}
+    occupied = {}
+    turned_away = np.zeros(n_peaks, dtype=np.int64)
+    departed = []
+
+    def record(slots):
+        departed.append((pool.peak[slots].copy(), pool.success[slots].copy(),
+                         pool.collisions[slots].copy(), pool.waiting_time_sum[slots].copy()))
+
+    _, rejected = place_surfers(pool, initial_surfers, 0, spot_conf, beach_conf, rng, at_shore=False)
+    turned_away += np.bincount(rejected, minlength=n_peaks)
+
+    for t in range(duration):
+
+        # spawn new waves
+        n_new = np.searchsorted(spawn_time, t, side="right") - next_wave
+        if n_new > 0:
+            new = schedule[next_wave:next_wave + n_new]
+            waves = {
+                "id": np.concatenate([waves["id"], np.arange(next_wave, next_wave + n_new)]),
+                "x": np.concatenate([waves["x"], np.full(n_new, float(OCEAN_X_MAX))]),
+                "height": np.concatenate([waves["height"], [w['height'] for w in new]]),
+                "speed": np.concatenate([waves["speed"], [w['speed'] for w in new]]),
+            }
+            next_wave += n_new
+
+        # update waves
+        waves["x"] = waves["x"] - waves["speed"]
+        in_water = waves["x"] > 0
+        if not in_water.all():
+            for wave_id in waves["id"][~in_water]:
+                occupied.pop(int(wave_id), None)
+            waves = {key: values[in_water] for key, values in waves.items()}
+
+        # update surfers, dispatching on the state at the start of the tick
+        active = np.flatnonzero(pool.active)
+        state = pool.state[active]
+        waiting = active[state == WAITING]
+        paddling = active[state == PADDLING]
+        riders = active[state == SURFING]
+        wiped = active[state == WIPEOUT]
+
+        catch_waves(pool, waiting, waves, occupied, rule, rng, alpha_success, peak_y)
+
+        towards = np.where(pool.x[paddling] > pool.bp[paddling], -1, 1)
+        pool.x[paddling] += towards * pool.speed[paddling]
+        pool.state[paddling[np.abs(pool.x[paddling] - pool.bp[paddling]) <= PADDLE_THRESHOLD]] = WAITING
+
+        ride_waves(pool, riders, t, rng)
+
+        pool.x[wiped] -= pool.wave_speed[wiped]
+        pool.land(wiped[pool.x[wiped] <= 0])
+
+        # departures (only from the lineup) and arrivals
+        active = np.flatnonzero(pool.active)
+        leaving = active[(pool.leave_time[active] <= t) & np.isin(pool.state[active], (WAITING, PADDLING))]
+        if len(leaving):
+            record(leaving)
+            pool.release(leaving)
+
+        _, rejected = place_surfers(pool, rng.poisson(beach_conf["arrival_rate"]), t, spot_conf, beach_conf, rng)
+        turned_away += np.bincount(rejected, minlength=n_peaks)
+
+    record(np.flatnonzero(pool.active))
+    peak, success, collisions, waiting_time_sum = (np.concatenate(parts) for parts in zip(*departed))
+
+    rows = {}
+    for p in range(n_peaks):
+        here = peak == p
+        rows[f"peak_{p}"] = {
+            **summarize(success[here], collisions[here], waiting_time_sum[here], len(wave_schedule), spot_level, None),
+            "turned_away": int(turned_away[p]),
+        }
+    rows["beach"] = {
+        **summarize(success, collisions, waiting_time_sum, len(wave_schedule), spot_level, None),
+        "turned_away": int(turned_away.sum()),
+    }
+    return pd.DataFrame.from_dict(rows, orient="index")
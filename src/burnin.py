@@ -0,0 +1,299 @@
+"""
+Burn-in once, then fork many replicates from the steady-state lineup.
+
+A cold session starts with surfers scattered by Surfer.initial_x, mostly paddling, and
+no waves in the water, so every replicate spends its first minutes reaching a steady
+lineup and its metrics include that transient. Here the transient is simulated once per
+configuration: burn_in runs it and snapshots the session into plain arrays, and every
+fork restores the snapshot (a few array copies), draws its own wave schedule and
+per-surfer streams from seed (seed, i), and measures metrics only from the fork on.
+
+run_many_forked writes the snapshot once to an .npz file; tasks carry only its path, and
+every worker loads it once (like src.wavebank.open_bank).
+"""
+import functools
+import os
+import shutil
+import tempfile
+import uuid
+
+from src.simulation import *
+
+# Surfer attributes stored in a snapshot, one array entry per surfer
+SURFER_FIELDS = ["skill", "alpha_success", "x", "y", "distance_on_wave", "ride_already_counted", "last_catch_time"]
+# Wave attributes stored in a snapshot, one array entry per wave
+WAVE_FIELDS = ["x", "height", "speed"]
+
+def snapshot_session(t):
+    """
+    Capture the current session (Surfer.all_surfers, Wave.all_waves) as arrays.
+
+    Waves that left the water but still carry surfers (wiping out towards the shore)
+    are kept as well, flagged with in_water False.
+
+    :param t: time of the snapshot (sec)
+    :return: dictionary of numpy arrays with 'surfer_<field>', 'surfer_state', 'surfer_wave'
+        (index of the wave ridden, -1 for none), 'wave_<field>', 'wave_in_water',
+        'occupied_y' and 'occupied_offsets' (wave i holds occupied_y[offsets[i]:offsets[i + 1]]),
+        plus the scalar 'time'
+    """
+    surfers = Surfer.all_surfers
+    waves = list(Wave.all_waves)
+    n_in_water = len(waves)
+    for surfer in surfers:
+        wave = surfer.curr_riding_wave
+        if wave is not None and not any(wave is w for w in waves):
+            waves.append(wave)
+    wave_index = {id(wave): i for i, wave in enumerate(waves)}
+
+    snapshot = {"time": t}
+    for field in SURFER_FIELDS:
+        values = [getattr(s, field) for s in surfers]
+        if field == "last_catch_time":
+            values = [np.nan if v is None else v for v in values]
+        snapshot[f"surfer_{field}"] = np.array(values, dtype=np.float64)
+    snapshot["surfer_state"] = np.array([s.state for s in surfers], dtype=str)
+    snapshot["surfer_wave"] = np.array([-1 if s.curr_riding_wave is None else wave_index[id(s.curr_riding_wave)]
+                                        for s in surfers], dtype=np.int64)
+
+    for field in WAVE_FIELDS:
+        snapshot[f"wave_{field}"] = np.array([getattr(w, field) for w in waves], dtype=np.float64)
+    snapshot["wave_in_water"] = np.arange(len(waves)) < n_in_water
+    snapshot["occupied_offsets"] = np.cumsum([0] + [len(w.occupied_y) for w in waves]).astype(np.int64)
+    snapshot["occupied_y"] = np.array([y for w in waves for y in w.occupied_y], dtype=np.float64)
+    return snapshot
+
+def restore_session(snapshot, rngs=None, metrics=None, time=0):
+    """
+    Replace the current session with the contents of a snapshot.
+
+    Restored surfers start with fresh stats; their last catch time is shifted so that the
+    snapshot time becomes the given time of the restored session.
+
+    :param snapshot: dictionary from snapshot_session (arrays or plain lists)
+    :param rngs: one random stream per surfer (None = the global numpy stream)
+    :param metrics: MetricsAccumulator the restored surfers report to
+    :param time: clock of the restored session at the snapshot (0 starts a new session)
+    :return: None
+    """
+    Wave.all_waves = []
+    Surfer.all_surfers = []
+
+    in_water = np.asarray(snapshot["wave_in_water"], dtype=bool)
+    offsets = np.asarray(snapshot["occupied_offsets"], dtype=np.int64)
+    occupied_y = np.asarray(snapshot["occupied_y"], dtype=np.float64)
+    waves = []
+    for i, (x, height, speed) in enumerate(zip(*(np.asarray(snapshot[f"wave_{f}"], dtype=np.float64) for f in WAVE_FIELDS))):
+        wave = Wave.__new__(Wave)
+        wave.x, wave.height, wave.speed = float(x), float(height), float(speed)
+        wave.occupied_y = occupied_y[offsets[i]:offsets[i + 1]].tolist()
+        if in_water[i]:
+            Wave.all_waves.append(wave)
+        waves.append(wave)
+
+    fields = {field: np.asarray(snapshot[f"surfer_{field}"], dtype=np.float64).tolist() for field in SURFER_FIELDS}
+    states = list(snapshot["surfer_state"])
+    wave_ids = np.asarray(snapshot["surfer_wave"], dtype=np.int64)
+    if rngs is None:
+        rngs = [None] * len(states)
+
+    for i, (state, rng) in enumerate(zip(states, rngs)):
+        last_catch_time = fields["last_catch_time"][i]
+        Surfer.restore(
+            skill=fields["skill"][i],
+            x=fields["x"][i],
+            y=fields["y"][i],
+            state=str(state),
+            curr_riding_wave=None if wave_ids[i] < 0 else waves[wave_ids[i]],
+            distance_on_wave=fields["distance_on_wave"][i],
+            ride_already_counted=bool(fields["ride_already_counted"][i]),
+            last_catch_time=None if np.isnan(last_catch_time) else last_catch_time - snapshot["time"] + time,
+            rng=rng,
+            alpha_success=fields["alpha_success"][i],
+            metrics=metrics,
+        )
+
+def snapshot_to_lists(snapshot):
+    """
+    Convert a snapshot to plain lists, so it can travel inside JSON tasks.
+
+    >>> snapshot_to_lists({"time": 5, "surfer_x": np.array([1.5, 2.0])})
+    {'time': 5, 'surfer_x': [1.5, 2.0]}
+    """
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in snapshot.items()}
+
+def save_snapshot(snapshot, directory):
+    """
+    Write a snapshot to a new .npz file in directory.
+
+    :param snapshot: dictionary from snapshot_session
+    :param directory: folder of the file (must be readable by every worker)
+    :return: path of the file; the name is unique, so load_snapshot can cache by path
+    """
+    path = os.path.join(directory, f"snapshot-{uuid.uuid4().hex}.npz")
+    np.savez(path, **snapshot)
+    return path
+
+@functools.lru_cache(maxsize=8)
+def load_snapshot(path):
+    """
+    Load (and keep) the snapshot at path, so repeated tasks in a worker read it once.
+
+    :param path: location of a file written by save_snapshot
+    :return: dictionary of numpy arrays and the scalar 'time', as from snapshot_session
+    >>> path = save_snapshot(burn_in(num_surfer=3, duration=20, seed=1), tempfile.mkdtemp())
+    >>> snapshot = load_snapshot(path)
+    >>> snapshot["time"], snapshot["surfer_state"].shape
+    (20, (3,))
+    """
+    with np.load(path) as data:
+        snapshot = {key: data[key] for key in data.files}
+    snapshot["time"] = snapshot["time"].item()
+    return snapshot
+
+def burn_in(
+        spot_level=SPOT_LEVEL,
+        rule_type=RULE_TYPE,
+        num_surfer=None,
+        ratio=None,
+        spot_conf=None,
+        mode=EXPR_CONF["mode"],
+        duration=BURN_IN_DURATION,
+        seed=None,
+):
+    """
+    Simulate the warm-up of a session and return its final state.
+
+    :param duration: length of the burn-in (sec)
+    :param seed: seed of the burn-in (None = the global numpy stream)
+    :return: a snapshot (see snapshot_session) taken at the end of the burn-in
+    >>> snapshot = burn_in(num_surfer=5, duration=30, seed=1)
+    >>> snapshot["time"], len(snapshot["surfer_x"])
+    (30, 5)
+    """
+    if spot_conf is None:
+        spot_conf = SPOT_CONF[spot_level]
+
+    metrics, wave_rng = start_session(spot_level, num_surfer, ratio, spot_conf, mode, seed)
+    waves = load_waves(duration, spot_conf, rng=wave_rng)
+    run_ticks(rule_type, waves, 0, duration, metrics)
+    return snapshot_session(duration)
+
+def run_forked(
+        snapshot,
+        spot_level=SPOT_LEVEL,
+        rule_type=RULE_TYPE,
+        ratio=None,
+        spot_conf=None,
+        duration=SESSION_DURATION,
+        seed=None,
+        timeseries=False,
+):
+    """
+    Run one session starting from a snapshot instead of a cold lineup.
+
+    The fork keeps the snapshot's surfers and waves in the water, and draws a new wave
+    schedule and new per-surfer decision streams from seed. Statistics cover the
+    duration seconds after the fork only.
+
+    :param snapshot: dictionary from snapshot_session or burn_in
+    :param duration: measured duration after the fork (sec)
+    :param seed: seed of this fork (None = the global numpy stream)
+    :param timeseries: also return 'timeseries' and 'waiting_time_quantiles' (see run_simulation)
+    :return: a dictionary containing simulation statistics
+    """
+    if spot_conf is None:
+        spot_conf = SPOT_CONF[spot_level]
+
+    n_surfers = len(snapshot["surfer_state"])
+    if seed is None:
+        wave_rng, rngs = np.random, None
+    else:
+        wave_rng, surfer_seed = make_streams(seed, 2)
+        rngs = make_streams(surfer_seed.randint(2 ** 31), n_surfers)
+
+    metrics = MetricsAccumulator(n_surfers)
+    restore_session(snapshot, rngs, metrics)
+    waves = load_waves(duration, spot_conf, rng=wave_rng)
+    run_ticks(rule_type, waves, 0, duration, metrics)
+
+    stats = compute_stats(metrics, waves[0], spot_level, ratio)
+    if timeseries:
+        stats["timeseries"] = metrics.timeseries()
+        stats["waiting_time_quantiles"] = metrics.waiting_time_quantiles()
+    return stats
+
+def run_fork_task(task):
+    """
+    Run one fork described by a task and return its METRICS row.
+
+    :param task: dictionary with the 'snapshot' (a snapshot or the path of a saved one),
+        run_forked keyword arguments ('kwargs') and a 'seed'
+    :return: dictionary of METRICS
+    """
+    snapshot = task["snapshot"]
+    if isinstance(snapshot, str):
+        snapshot = load_snapshot(snapshot)
+    res = run_forked(snapshot, **task["kwargs"], seed=task["seed"])
+    return {key: res[key] for key in METRICS}
+
+def run_many_forked(
+        number_of_runs=100,
+        burn_in_duration=BURN_IN_DURATION,
+        mode=None,
+        spot_level=None,
+        rule_type=None,
+        num_surfer=None,
+        ratio=None,
+        spot_conf=None,
+        duration=None,
+        seed=None,
+        backend=None,
+        snapshot_dir=None,
+):
+    """
+    Monte Carlo replicates that share one burn-in (see run_many for the common arguments).
+
+    The burn-in is run once, from a child stream of seed; replicate i forks from it with seed (seed, i).
+
+    :param burn_in_duration: length of the shared burn-in (sec)
+    :param duration: measured duration of every replicate after the fork (sec)
+    :param snapshot_dir: folder for the shared snapshot file, removed afterwards (None = a
+        temporary folder; pass a shared folder when FileQueueBackend workers run on other hosts)
+    :return: (per-replicate rows, mean, std) like run_many
+    """
+    if mode is None: mode=EXPR_CONF["mode"]
+    if spot_level is None: spot_level=SPOT_LEVEL
+    if rule_type is None: rule_type=RULE_TYPE
+    if spot_conf is None: spot_conf=SPOT_CONF[spot_level]
+    if duration is None: duration=SESSION_DURATION
+    if backend is None: backend = SerialBackend()
+    if seed is None: seed = np.random.SeedSequence().entropy
+    if mode != "experiment": ratio = None
+
+    snapshot = burn_in(spot_level, rule_type, num_surfer, ratio, spot_conf, mode, burn_in_duration,
+                       seed=np.random.SeedSequence(seed).spawn(1)[0])
+
+    kwargs = {
+        "spot_level": spot_level,
+        "rule_type": rule_type,
+        "ratio": ratio,
+        "spot_conf": spot_conf,
+        "duration": duration,
+    }
+
+    tmp = tempfile.mkdtemp() if snapshot_dir is None else None
+    path = save_snapshot(snapshot, snapshot_dir or tmp)
+    try:
+        tasks = [{"snapshot": path, "kwargs": kwargs, "seed": [seed, i]} for i in range(number_of_runs)]
+
+        print(f" Running {number_of_runs} Monte Carlo iterations from one {burn_in_duration}s burn-in...")
+
+        results = list(backend.map(run_fork_task, tasks))
+    finally:
+        os.remove(path)
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    df = pd.DataFrame(results)
+    return results, df.mean(), df.std()
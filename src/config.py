@@ -8,7 +8,9 @@ Stores all parameter settings for the surfing simulation.
 
 SESSION_DURATION = 3600      # Simulation time in seconds
 SPOT_LEVEL = "beginner"      # "beginner", "mixed", "advanced"
-RULE_TYPE = "free_for_all"   # "free_for_all", "safe_distance"
+RULE_TYPE = "free_for_all"   # any name in src/rules.py RULES: "free_for_all", "safe_distance", "closest_to_peak", ...
+METRICS_SAMPLE_INTERVAL = 60 # Seconds between time-series samples of in-loop metrics
+BURN_IN_DURATION = 600       # Warm-up simulated once before forked replicates (sec)
 
 EXPR_CONF = {
     "mode": "realistic",      # "realistic" or "experiment"
@@ -35,6 +37,9 @@ OCEAN_X_MAX = 150
 LINEUP_X_NEAR_SHORE = 10
 LINEUP_X_OUTSIDE = 90
 
+# Peak Location (Y-coordinate where waves break first; used by priority rules)
+PEAK_Y = 0
+
 # Best Position (BP) Range
 BP_X_MIN = 30
 BP_X_MAX = 80
@@ -96,4 +101,56 @@ SPOT_CONF = {
         "num_surfer":  {"mean": 30, "std": 10},
         "wave_speed":  {"min": 4.5, "max": 7.5}
     },
-}
\ No newline at end of file
+}
+
+# ==========================================
+# 5. BEACH MODE (Multi-Peak, Dynamic Crowd)
+# ==========================================
+# Settings for src/beach.py. Each peak is a BP zone centred at "y" (Meters along the beach);
+# "bp_shift" moves its take-off spot offshore (+) or inshore (-), and "weight" is the share
+# of arriving surfers who paddle out there.
+
+BEACH_CONF = {
+    "y_min": -1000,
+    "y_max": 1000,
+    "peaks": [
+        {"y": -800, "width": 120, "bp_shift": -5, "weight": 1.0},
+        {"y": -400, "width": 120, "bp_shift": 0, "weight": 1.0},
+        {"y": 0, "width": 150, "bp_shift": 10, "weight": 1.5},
+        {"y": 400, "width": 120, "bp_shift": 0, "weight": 1.0},
+        {"y": 800, "width": 120, "bp_shift": -5, "weight": 1.0},
+    ],
+    "arrival_rate": 0.2,     # Poisson arrivals per second (whole beach)
+    "mean_stay": 2700,       # Mean session length of a surfer (sec, exponential)
+    "capacity": 5000,        # Surfer slots in the pool (arrivals beyond this are turned away)
+}
+
+
+# ==========================================
+# 6. SENSITIVITY ANALYSIS
+# ==========================================
+# Parameters varied jointly by src/sensitivity.py. Names are paths into a SPOT_CONF
+# entry ("wave_height.mu"); "alpha_success" stands for ALPHA_SUCCESS. A min/max entry
+# is varied as its "center" and "width", so every design point keeps min <= max.
+
+SENSITIVITY_PARAMS = [
+    "lambda_set",
+    "wave_height.mu",
+    "wave_height.sigma",
+    "wave_speed.center",
+    "wave_speed.width",
+    "skill.alpha",
+    "skill.beta",
+    "alpha_success",
+]
+SENSITIVITY_SPREAD = 0.25     # Default range: base value +/- 25%
+
+
+# ==========================================
+# 7. RARE-EVENT ESTIMATION
+# ==========================================
+# Levels of the collision score used by src/splitting.py: the distance (m) between a
+# surfing rider and the closest surfer it could collide with. A collision itself
+# (distance below 3 m) is the final level.
+
+SPLITTING_LEVELS = [20, 10, 6]
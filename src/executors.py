@@ -0,0 +1,349 @@
+"""
+Job backends that run batches of simulation tasks, locally or across hosts.
+
+A backend applies a module-level function to a list of JSON-friendly tasks and yields
+the results in task order. Tasks are grouped into batches of batch_size to amortize
+the per-dispatch overhead. Since every task carries its own seed, a failed batch can
+simply be run again, and all backends return exactly the results of a serial run.
+
+FileQueueBackend shares work through a directory (for example on a network file
+system). Workers on any host pull batches from it with:
+
+    python -m src.executors worker /shared/queue
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+QUEUE_FOLDERS = ["pending", "running", "done", "failed"]
+
+def function_path(fn):
+    """
+    Return the import path of a module-level function.
+
+    >>> function_path(json.dumps)
+    'json:dumps'
+    """
+    return f"{fn.__module__}:{fn.__qualname__}"
+
+def resolve_function(path):
+    """
+    Import a function from its 'module:name' path.
+
+    >>> resolve_function("json:dumps") is json.dumps
+    True
+    """
+    module, name = path.split(":")
+    return getattr(importlib.import_module(module), name)
+
+def to_json(value):
+    """
+    json.dump hook for numpy scalars and arrays in tasks and results.
+
+    >>> import numpy as np
+    >>> json.dumps({"num_surfer": np.int64(3), "ratio": np.float64(0.5)}, default=to_json)
+    '{"num_surfer": 3, "ratio": 0.5}'
+    """
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def run_batch(fn, batch):
+    """Apply fn (a function or its import path) to every task of a batch."""
+    if isinstance(fn, str):
+        fn = resolve_function(fn)
+    return [fn(task) for task in batch]
+
+class Backend:
+    """
+    Base class of job backends.
+
+    Attributes:
+        batch_size (int): Number of tasks dispatched together.
+        retries (int): How many times a failed batch is run again before giving up.
+    """
+    def __init__(self, batch_size=1, retries=2):
+        self.batch_size = batch_size
+        self.retries = retries
+
+    def batches(self, tasks):
+        """Split tasks into batches of batch_size."""
+        tasks = list(tasks)
+        return [tasks[i:i + self.batch_size] for i in range(0, len(tasks), self.batch_size)]
+
+    def map(self, fn, tasks):
+        """
+        Apply fn to every task.
+
+        :param fn: a module-level function taking one task
+        :param tasks: an iterable of tasks
+        :return: an iterator over the results, in task order
+        """
+        raise NotImplementedError
+
+class SerialBackend(Backend):
+    """
+    Runs every task in the calling process.
+
+    >>> list(SerialBackend().map(abs, [-1, 2, -3]))
+    [1, 2, 3]
+    """
+    def map(self, fn, tasks):
+        for batch in self.batches(tasks):
+            yield from run_batch(fn, batch)
+
+class ProcessPoolBackend(Backend):
+    """
+    Runs batches on a local process pool.
+
+    A crashed worker breaks the whole pool and fails every batch running in it, so pool
+    breakage is not charged to the batches: the pool is replaced and they are resubmitted,
+    up to max_restarts times per map.
+
+    Attributes:
+        max_workers (int): Number of worker processes (None = all cores).
+        max_restarts (int): How many times a broken pool is replaced before giving up.
+    """
+    def __init__(self, max_workers=None, batch_size=1, retries=2, max_restarts=5):
+        super().__init__(batch_size, retries)
+        self.max_workers = max_workers
+        self.max_restarts = max_restarts
+
+    def map(self, fn, tasks):
+        batches = self.batches(tasks)
+        results = [None] * len(batches)
+        attempts = [0] * len(batches)
+        restarts = 0
+        next_batch = 0
+
+        pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            running = {pool.submit(run_batch, fn, batch): (i, pool) for i, batch in enumerate(batches)}
+
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i, origin = running.pop(future)
+                    try:
+                        results[i] = future.result()
+                        continue
+                    except BrokenProcessPool:
+                        # the first batch reporting a broken pool replaces it; the others just resubmit
+                        if origin is pool:
+                            restarts += 1
+                            if restarts > self.max_restarts:
+                                raise
+                            pool.shutdown(wait=False, cancel_futures=True)
+                            pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                    except Exception:
+                        attempts[i] += 1
+                        if attempts[i] > self.retries:
+                            raise
+                    running[pool.submit(run_batch, fn, batches[i])] = (i, pool)
+
+                # hand out results in order as soon as the next batch is complete
+                while next_batch < len(batches) and results[next_batch] is not None:
+                    yield from results[next_batch]
+                    results[next_batch] = None
+                    next_batch += 1
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+class FileQueueBackend(Backend):
+    """
+    Shares batches with worker processes through a queue directory.
+
+    The coordinator writes each batch to pending/; a worker claims it by renaming it to
+    running/, and writes its results to done/ (or the error to failed/). Batches that fail
+    or whose worker has not finished within lease seconds are moved back to pending/.
+
+    Attributes:
+        queue_dir (str): The shared queue directory.
+        local_workers (int): Worker processes started on this host for the duration of map.
+        lease (float): Seconds after which a running batch is considered lost.
+        poll_interval (float): Seconds between checks of the queue.
+        timeout (float): Maximum seconds to wait for a job (None = no limit).
+    """
+    def __init__(self, queue_dir, local_workers=0, batch_size=8, retries=2, lease=600, poll_interval=0.2, timeout=None):
+        super().__init__(batch_size, retries)
+        self.queue_dir = queue_dir
+        self.local_workers = local_workers
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def path(self, folder, name):
+        return os.path.join(self.queue_dir, folder, name)
+
+    def submit(self, name, payload):
+        """Atomically place a batch in pending/."""
+        tmp = self.path("pending", f".{name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(payload, f, default=to_json)
+        os.replace(tmp, self.path("pending", name))
+
+    def map(self, fn, tasks):
+        for folder in QUEUE_FOLDERS:
+            os.makedirs(os.path.join(self.queue_dir, folder), exist_ok=True)
+
+        job = uuid.uuid4().hex[:12]
+        batches = self.batches(tasks)
+        names = [f"{job}-{i:06d}.json" for i in range(len(batches))]
+        payloads = [{"fn": function_path(fn), "tasks": batch} for batch in batches]
+        for name, payload in zip(names, payloads):
+            self.submit(name, payload)
+
+        workers = [multiprocessing.Process(target=worker_loop, args=(self.queue_dir,), kwargs={"job": job})
+                   for _ in range(self.local_workers)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            yield from self.collect(names, payloads)
+        finally:
+            for worker in workers:
+                worker.terminate()
+                worker.join()
+            leftovers = set(names)
+            for folder in QUEUE_FOLDERS:
+                for name in leftovers.intersection(os.listdir(os.path.join(self.queue_dir, folder))):
+                    try:
+                        os.remove(self.path(folder, name))
+                    except FileNotFoundError:
+                        pass
+
+    def collect(self, names, payloads):
+        """
+        Wait for the batches of a job, requeueing failed or lost ones, and yield results in order.
+
+        Every poll lists done/ and failed/ once instead of checking each outstanding batch,
+        and leases of running batches are only checked a few times per lease.
+        """
+        index = {name: i for i, name in enumerate(names)}
+        results = {}
+        attempts = [0] * len(names)
+        next_batch = 0
+        start = last_lease_check = time.time()
+        lease_check_interval = max(self.poll_interval, self.lease / 10)
+
+        def requeue(i, error):
+            attempts[i] += 1
+            if attempts[i] > self.retries:
+                raise RuntimeError(f"batch {names[i]} failed {attempts[i]} times: {error}")
+            self.submit(names[i], payloads[i])
+
+        while next_batch < len(names):
+            for name in os.listdir(os.path.join(self.queue_dir, "done")):
+                if name in index:
+                    # a batch requeued after its lease expired may finish twice
+                    if index[name] >= next_batch:
+                        with open(self.path("done", name)) as f:
+                            results[index[name]] = json.load(f)
+                    os.remove(self.path("done", name))
+
+            for name in os.listdir(os.path.join(self.queue_dir, "failed")):
+                if name in index:
+                    with open(self.path("failed", name)) as f:
+                        error = json.load(f)["error"]
+                    os.remove(self.path("failed", name))
+                    if index[name] >= next_batch and index[name] not in results:
+                        requeue(index[name], error)
+
+            if time.time() - last_lease_check >= lease_check_interval:
+                last_lease_check = time.time()
+                for name in os.listdir(os.path.join(self.queue_dir, "running")):
+                    if name not in index or index[name] in results:
+                        continue
+                    try:
+                        if time.time() - os.path.getmtime(self.path("running", name)) < self.lease:
+                            continue
+                        os.remove(self.path("running", name))
+                    except FileNotFoundError:
+                        continue   # finished in the meantime
+                    requeue(index[name], f"lease of {self.lease}s expired")
+
+            while next_batch in results:
+                yield from results.pop(next_batch)
+                next_batch += 1
+
+            if self.timeout is not None and time.time() - start > self.timeout:
+                raise TimeoutError(f"job not finished after {self.timeout}s")
+            if next_batch < len(names):
+                time.sleep(self.poll_interval)
+
+def claim_batch(queue_dir, job=None):
+    """
+    Claim one pending batch by moving it to running/.
+
+    :param queue_dir: the shared queue directory
+    :param job: only claim batches of this job id (None = any job)
+    :return: the batch file name, or None if nothing is pending
+    """
+    for name in sorted(os.listdir(os.path.join(queue_dir, "pending"))):
+        if name.startswith(".") or (job is not None and not name.startswith(job)):
+            continue
+        running = os.path.join(queue_dir, "running", name)
+        try:
+            os.rename(os.path.join(queue_dir, "pending", name), running)
+        except FileNotFoundError:
+            continue   # another worker was faster
+        os.utime(running)   # start the lease now
+        return name
+    return None
+
+def worker_loop(queue_dir, job=None, idle_timeout=None, poll_interval=0.2):
+    """
+    Pull and run batches from a queue directory until idle for idle_timeout seconds.
+
+    :param queue_dir: the shared queue directory
+    :param job: only run batches of this job id (None = any job)
+    :param idle_timeout: seconds without work before returning (None = run forever)
+    :param poll_interval: seconds between checks of the queue
+    :return: int, the number of batches run
+    """
+    for folder in QUEUE_FOLDERS:
+        os.makedirs(os.path.join(queue_dir, folder), exist_ok=True)
+
+    n_batches = 0
+    idle_since = time.time()
+    while idle_timeout is None or time.time() - idle_since < idle_timeout:
+        name = claim_batch(queue_dir, job)
+        if name is None:
+            time.sleep(poll_interval)
+            continue
+
+        running = os.path.join(queue_dir, "running", name)
+        try:
+            with open(running) as f:
+                payload = json.load(f)
+            results = run_batch(payload["fn"], payload["tasks"])
+            target, content = "done", results
+        except Exception:
+            target, content = "failed", {"error": traceback.format_exc()}
+
+        tmp = os.path.join(queue_dir, target, f".{name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(content, f, default=to_json)
+        os.replace(tmp, os.path.join(queue_dir, target, name))
+        if os.path.exists(running):
+            os.remove(running)
+
+        n_batches += 1
+        idle_since = time.time()
+    return n_batches
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run simulation batches from a shared queue directory.")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("queue_dir")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="exit after this many idle seconds")
+    args = parser.parse_args()
+
+    print(f"Ran {worker_loop(args.queue_dir, idle_timeout=args.idle_timeout)} batches.")
@@ -0,0 +1,265 @@
+"""
+Incremental metrics collected inside the simulation tick loop.
+
+Surfers report their state transitions, collisions and successful rides to a
+MetricsAccumulator as they happen; each report costs O(1). Every
+METRICS_SAMPLE_INTERVAL ticks the accumulator stores one row of its time series,
+and at the end of a run compute_stats reads the final counters from it.
+"""
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from src.config import *
+
+STATES = ['waiting', 'paddling', 'surfing', 'wipeout']
+
+def gini_from_counts(histogram):
+    """
+    Computes the Gini index from a histogram of success counts.
+
+    Equivalent to gini() on the expanded list, in O(k log k) for k distinct counts.
+
+    :param histogram: a mapping from success count to the number of surfers with it
+    :return: float, the Gini index
+    >>> from src.simulation import gini
+    >>> gini_from_counts(Counter([0, 1, 1, 4])) == gini([0, 1, 1, 4])
+    True
+    >>> gini_from_counts({0: 5})
+    0.0
+    """
+    n = 0
+    total = 0
+    pair_sum = 0   # sum of |x_i - x_j| over unordered pairs
+    for value in sorted(histogram):
+        freq = histogram[value]
+        if freq <= 0:
+            continue
+        pair_sum += freq * (n * value - total)
+        n += freq
+        total += freq * value
+
+    if total == 0:
+        return 0.0
+    return float(pair_sum / (n * total))
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch with bounded relative error.
+
+    Values are counted in logarithmic buckets of ratio gamma = (1 + a) / (1 - a), so
+    every quantile is returned within a relative error a of the exact value while
+    memory grows only with the log of the value range.
+
+    Attributes:
+        relative_accuracy (float): The relative error bound a.
+        count (int): Number of values added.
+    >>> sketch = QuantileSketch(0.01)
+    >>> for v in range(1, 1001):
+    ...     sketch.add(v)
+    >>> abs(sketch.quantile(0.5) - 500) <= 0.01 * 500
+    True
+    >>> sketch.quantile(0.0) <= 1.01, sketch.count
+    (True, 1000)
+    """
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = Counter()
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value):
+        """Add a non-negative value to the sketch."""
+        self.count += 1
+        if value <= 0:
+            self.zeros += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self.log_gamma)] += 1
+
+    def quantile(self, q):
+        """
+        Return the approximate q-quantile (NaN if the sketch is empty).
+
+        :param q: quantile in [0, 1]
+        :return: float
+        """
+        if self.count == 0:
+            return float("nan")
+
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+class MetricsAccumulator:
+    """
+    Running session metrics updated by surfers during the tick loop.
+
+    Attributes:
+        occupancy (Counter): Number of surfers currently in each state.
+        n_registered (int): Number of registered surfers.
+        success (ndarray): Success count of each registered surfer.
+        collisions (ndarray): Collision count of each registered surfer.
+        waiting_time_sum (ndarray): Summed waiting time of each registered surfer.
+        waiting_times (QuantileSketch): Sketch of individual waiting times between rides.
+        samples (list): Time-series rows recorded every sample_interval ticks.
+    """
+    def __init__(self, n_surfers=0, sample_interval=METRICS_SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self.n_registered = 0
+
+        self.occupancy = Counter()
+        # per-surfer counters live in the first n_registered entries of arrays that
+        # double in capacity when full, so registering stays amortized O(1)
+        self._success = np.zeros(n_surfers, dtype=np.int64)
+        self._collisions = np.zeros(n_surfers, dtype=np.int64)
+        self._waiting_time_sum = np.zeros(n_surfers)
+        self.success_histogram = Counter()
+        self.waiting_times = QuantileSketch()
+
+        self.interval_events = Counter()
+        # successes of every surfer in the current interval, and their histogram (surfers
+        # without a success in the interval are added when the row is sampled)
+        self.interval_success = Counter()
+        self.interval_histogram = Counter()
+        self.samples = []
+
+    @classmethod
+    def from_surfers(cls, surfers):
+        """
+        Build an accumulator holding the final counters of a list of surfers.
+
+        :param surfers: objects with 'stats' and 'waiting_time_sum' attributes
+        :return: a MetricsAccumulator
+        """
+        metrics = cls(len(surfers))
+        metrics.n_registered = len(surfers)
+        metrics.success[:] = [s.stats['success'] for s in surfers]
+        metrics.collisions[:] = [s.stats['collisions'] for s in surfers]
+        metrics.waiting_time_sum[:] = [s.waiting_time_sum for s in surfers]
+        metrics.success_histogram = Counter(metrics.success.tolist())
+        return metrics
+
+    @property
+    def success(self):
+        return self._success[:self.n_registered]
+
+    @property
+    def collisions(self):
+        return self._collisions[:self.n_registered]
+
+    @property
+    def waiting_time_sum(self):
+        return self._waiting_time_sum[:self.n_registered]
+
+    def register(self, state):
+        """
+        Register a new surfer in the given state.
+
+        :param state: the surfer's initial state
+        :return: int, the surfer's index in the counter arrays
+        """
+        index = self.n_registered
+        if index == len(self._success):
+            capacity = max(2 * index, 16)
+            for name in ("_success", "_collisions", "_waiting_time_sum"):
+                grown = np.zeros(capacity, dtype=getattr(self, name).dtype)
+                grown[:index] = getattr(self, name)
+                setattr(self, name, grown)
+        self.n_registered += 1
+        self.occupancy[state] += 1
+        self.success_histogram[0] += 1
+        return index
+
+    def on_transition(self, old_state, new_state):
+        """Record a surfer changing state."""
+        self.occupancy[old_state] -= 1
+        self.occupancy[new_state] += 1
+
+    def on_collision(self, index):
+        """Record a collision of surfer index."""
+        self._collisions[index] += 1
+        self.interval_events['collisions'] += 1
+
+    def on_wipeout(self, index):
+        """Record a wipeout (not caused by a collision) of surfer index."""
+        self.interval_events['wipeouts'] += 1
+
+    def on_success(self, index, waiting_time=None):
+        """
+        Record a successful ride of surfer index.
+
+        :param index: the surfer's index
+        :param waiting_time: time since the surfer's previous successful ride, if any
+        """
+        count = self._success[index]
+        self.success_histogram[count] -= 1
+        self.success_histogram[count + 1] += 1
+        self._success[index] = count + 1
+        self.interval_events['success'] += 1
+
+        count = self.interval_success[index]
+        self.interval_histogram[count] -= 1
+        self.interval_histogram[count + 1] += 1
+        self.interval_success[index] = count + 1
+
+        if waiting_time is not None:
+            self._waiting_time_sum[index] += waiting_time
+            self.waiting_times.add(waiting_time)
+
+    def tick(self, t):
+        """Close tick t, recording a time-series row at the end of every sample interval."""
+        if (t + 1) % self.sample_interval == 0:
+            self.sample(t + 1)
+
+    def sample(self, t):
+        """
+        Append one time-series row for time t and reset the per-interval event counts.
+
+        :param t: time (sec) at the end of the interval
+        """
+        per_minute = 60 / self.sample_interval
+        row = {"time": t}
+        for state in STATES:
+            row[state] = self.occupancy[state]
+        row["collisions_per_min"] = self.interval_events['collisions'] * per_minute
+        row["wipeouts_per_min"] = self.interval_events['wipeouts'] * per_minute
+        row["success_per_min"] = self.interval_events['success'] * per_minute
+        row["gini"] = gini_from_counts(self.success_histogram)
+        self.interval_histogram[0] = self.n_registered - len(self.interval_success)
+        row["gini_interval"] = gini_from_counts(self.interval_histogram)
+        row["median_waiting_time"] = self.waiting_times.quantile(0.5)
+        self.samples.append(row)
+        self.interval_events.clear()
+        self.interval_success.clear()
+        self.interval_histogram.clear()
+
+    def timeseries(self):
+        """
+        Return the recorded time series.
+
+        :return: DataFrame indexed by time with state occupancy, event rates per minute,
+            the Gini index of success counts so far ('gini') and of the successes within
+            each interval ('gini_interval'), and the running median waiting time
+        """
+        columns = ["time"] + STATES + ["collisions_per_min", "wipeouts_per_min", "success_per_min", "gini",
+                                       "gini_interval", "median_waiting_time"]
+        return pd.DataFrame(self.samples, columns=columns).set_index("time")
+
+    def waiting_time_quantiles(self, quantiles=(0.1, 0.25, 0.5, 0.75, 0.9)):
+        """
+        Return approximate quantiles of the individual waiting times between rides.
+
+        :param quantiles: quantiles to report
+        :return: dictionary mapping each quantile to its value
+        """
+        return {q: self.waiting_times.quantile(q) for q in quantiles}
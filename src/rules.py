@@ -0,0 +1,328 @@
+"""
+Registry of lineup rules that decide which waiting surfers may go for which waves.
+
+Every tick, the engine lists the candidate pairs (a waiting surfer within
+CATCH_WAVE_THRESHOLD of a wave) together with array state of the lineup, and the rule
+returns in one call which of the pairs are permitted. Permitted surfers then attempt
+their waves with the usual probability models. run_simulation lets the permitted
+surfers act one after another and asks Rule.yields before every attempt, so a rule can
+also react to surfers who caught the wave earlier in the same tick (safe_distance does).
+The beach engine draws the attempts on a wave together and only uses allowed.
+
+Rules are registered by name with register_rule; get_rule rejects unknown names.
+Priority rules work per lineup group: a wave at one peak (run_simulation has a single
+peak at PEAK_Y, the beach engine one per BEACH_CONF peak).
+
+Benchmark every registered rule with:
+
+    python -m src.rules --surfers 2000 --waves 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.config import *
+
+RULES = {}
+
+def register_rule(cls):
+    """
+    Class decorator adding a rule to RULES under its name.
+
+    :param cls: a Rule subclass with a unique 'name'
+    :return: cls
+    """
+    if cls.name in RULES:
+        raise ValueError(f"rule {cls.name!r} is already registered")
+    RULES[cls.name] = cls()
+    return cls
+
+def get_rule(rule_type):
+    """
+    Look up a rule by name (Rule instances are returned unchanged).
+
+    >>> get_rule("safe_distance").name
+    'safe_distance'
+    >>> get_rule("safe-distance-rule")
+    Traceback (most recent call last):
+        ...
+    ValueError: unknown rule_type: 'safe-distance-rule' (choose from closest_to_peak, free_for_all, one_surfer_per_wave, rotation_queue, safe_distance)
+    """
+    if isinstance(rule_type, Rule):
+        return rule_type
+    try:
+        return RULES[rule_type]
+    except (KeyError, TypeError):
+        raise ValueError(f"unknown rule_type: {rule_type!r} (choose from {', '.join(sorted(RULES))})") from None
+
+def candidate_pairs(x, wave_x, threshold=CATCH_WAVE_THRESHOLD):
+    """
+    Find every (surfer, wave) pair with the surfer within threshold of the wave.
+
+    :param x: x-coordinates of the waiting surfers
+    :param wave_x: x-coordinates of the waves
+    :param threshold: catch distance (m)
+    :return: tuple of index arrays (surfer, wave), ordered by wave, then by surfer x
+    >>> s, w = candidate_pairs(np.array([10.0, 50.0, 11.5]), np.array([11.0, 80.0, 49.0]))
+    >>> s.tolist(), w.tolist()
+    ([0, 2, 1], [0, 0, 2])
+    """
+    order = np.argsort(x)
+    sorted_x = x[order]
+    # widened bounds, then the exact |wave_x - x| <= threshold test
+    lo = np.searchsorted(sorted_x, wave_x - threshold - 1, side="left")
+    hi = np.searchsorted(sorted_x, wave_x + threshold + 1, side="right")
+    counts = hi - lo
+
+    wave = np.repeat(np.arange(len(wave_x)), counts)
+    positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    surfer = order[positions]
+    close = np.abs(wave_x[wave] - x[surfer]) <= threshold
+    return surfer[close], wave[close]
+
+def first_in_group(group, key):
+    """
+    Mark the entry with the smallest key in every group (ties go to the earlier entry).
+
+    >>> first_in_group(np.array([0, 0, 1, 0]), np.array([3.0, 1.0, 5.0, 1.0])).tolist()
+    [False, True, True, False]
+    """
+    first = np.zeros(len(group), dtype=bool)
+    if len(group):
+        order = np.lexsort((np.arange(len(group)), key, group))
+        leaders = np.r_[True, group[order][1:] != group[order][:-1]]
+        first[order[leaders]] = True
+    return first
+
+def group_minimum(group, values, n_groups):
+    """
+    Smallest value per group (inf for groups without entries).
+
+    >>> group_minimum(np.array([0, 2, 0]), np.array([4.0, 1.0, 2.0]), 3).tolist()
+    [2.0, inf, 1.0]
+    """
+    minimum = np.full(n_groups, np.inf)
+    np.minimum.at(minimum, group, values)
+    return minimum
+
+class Rule:
+    """
+    Base class of lineup rules.
+
+    Rules are stateless; allowed receives a dictionary of arrays describing the tick:
+
+    - 'surfer', 'wave': the candidate pairs (indices into the surfer and wave arrays)
+    - 'x', 'y', 'peak', 'peak_y', 'queue_time': per waiting surfer; queue_time is when
+      the surfer last rode a wave (NaN if never, which puts them first in a queue)
+    - 'wave_x': per wave
+    - 'rider_wave', 'rider_y', 'rider_peak', 'rider_peak_y': per surfer who already caught one of the waves
+    - 'group', 'rider_group', 'n_groups': lineup group (wave and peak) of every pair and rider
+
+    Attributes:
+        name (str): Registry name, used as rule_type.
+    """
+    name = None
+
+    def allowed(self, candidates):
+        """
+        Decide which candidate pairs may attempt their wave.
+
+        :param candidates: dictionary of arrays as described above
+        :return: boolean array, one entry per candidate pair
+        """
+        raise NotImplementedError
+
+    def yields(self, y, riders_y):
+        """
+        Whether a permitted surfer backs off a wave because of the surfers now riding it.
+
+        :param y: y-coordinate of the surfer about to attempt the wave
+        :param riders_y: y-coordinates of the surfers who caught the wave, including this tick
+        :return: bool
+        """
+        return False
+
+@register_rule
+class FreeForAll(Rule):
+    """Everyone in position goes for every wave."""
+    name = "free_for_all"
+
+    def allowed(self, candidates):
+        return np.ones(len(candidates["surfer"]), dtype=bool)
+
+@register_rule
+class SafeDistance(Rule):
+    """
+    Nobody drops in within SAFE_DISTANCE (along the beach) of a surfer who already caught the wave,
+    including surfers who caught it earlier in the same tick.
+    """
+    name = "safe_distance"
+
+    def allowed(self, candidates):
+        pair_wave = candidates["wave"]
+        pair_y = candidates["y"][candidates["surfer"]]
+        if len(candidates["rider_y"]) == 0:
+            return np.ones(len(pair_wave), dtype=bool)
+
+        # riders sorted by (wave, y) on one composite key, so each pair finds the riders
+        # near it on its own wave with a binary search
+        span = 2 * max(np.abs(pair_y).max(), np.abs(candidates["rider_y"]).max()) + 4 * SAFE_DISTANCE + 4
+        order = np.lexsort((candidates["rider_y"], candidates["rider_wave"]))
+        rider_wave = candidates["rider_wave"][order]
+        rider_y = candidates["rider_y"][order]
+        rider_key = rider_wave * span + rider_y
+        pair_key = pair_wave * span + pair_y
+        lo = np.searchsorted(rider_key, pair_key - SAFE_DISTANCE - 1, side="left")
+        counts = np.searchsorted(rider_key, pair_key + SAFE_DISTANCE + 1, side="right") - lo
+
+        pair = np.repeat(np.arange(len(pair_wave)), counts)
+        rider = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+        too_close = (rider_wave[rider] == pair_wave[pair]) & (np.abs(pair_y[pair] - rider_y[rider]) <= SAFE_DISTANCE)
+        return np.bincount(pair[too_close], minlength=len(pair_wave)) == 0
+
+    def yields(self, y, riders_y):
+        return any(abs(y - rider_y) <= SAFE_DISTANCE for rider_y in riders_y)
+
+@register_rule
+class ClosestToPeak(Rule):
+    """
+    The surfer closest to the peak has priority: only the candidate nearest to the peak goes,
+    and only if nobody already on the wave is nearer to the peak.
+    """
+    name = "closest_to_peak"
+
+    def allowed(self, candidates):
+        surfer = candidates["surfer"]
+        distance = np.abs(candidates["y"][surfer] - candidates["peak_y"][surfer])
+        rider_distance = np.abs(candidates["rider_y"] - candidates["rider_peak_y"])
+
+        rider_best = group_minimum(candidates["rider_group"], rider_distance, candidates["n_groups"])
+        return first_in_group(candidates["group"], distance) & (distance < rider_best[candidates["group"]])
+
+@register_rule
+class OneSurferPerWave(Rule):
+    """A wave is left alone once someone rides it; otherwise it goes to the surfer closest to its crest."""
+    name = "one_surfer_per_wave"
+
+    def allowed(self, candidates):
+        ridden = np.bincount(candidates["rider_group"], minlength=candidates["n_groups"]) > 0
+        offset = np.abs(candidates["x"][candidates["surfer"]] - candidates["wave_x"][candidates["wave"]])
+        return first_in_group(candidates["group"], offset) & ~ridden[candidates["group"]]
+
+@register_rule
+class RotationQueue(Rule):
+    """Surfers take turns: the candidate whose last ride is longest ago (or who has not ridden yet) goes."""
+    name = "rotation_queue"
+
+    def allowed(self, candidates):
+        queue_time = candidates["queue_time"][candidates["surfer"]]
+        return first_in_group(candidates["group"], np.where(np.isnan(queue_time), -np.inf, queue_time))
+
+def permitted_pairs(rule, x, y, wave_x, rider_wave, rider_y, peak=None, peak_y=None, queue_time=None, rider_peak=None):
+    """
+    Ask a rule which waiting surfers may attempt which waves this tick.
+
+    :param rule: a rule name or Rule
+    :param x: x-coordinates of the waiting surfers
+    :param y: y-coordinates of the waiting surfers
+    :param wave_x: x-coordinates of the active waves
+    :param rider_wave: wave index of every surfer who already caught one of the waves
+    :param rider_y: y-coordinate of those surfers when they caught it
+    :param peak: peak index of every waiting surfer (default: a single peak)
+    :param peak_y: y-coordinate of every waiting surfer's peak (default: PEAK_Y)
+    :param queue_time: time of every waiting surfer's last ride, NaN if none (default: none)
+    :param rider_peak: peak index of every rider (default: a single peak)
+    :return: tuple of index arrays (surfer, wave) of the permitted pairs, ordered by wave, then by surfer x
+    >>> s, w = permitted_pairs("safe_distance", np.array([40.0, 40.0]), np.array([0.0, 30.0]),
+    ...                        np.array([41.0]), rider_wave=np.array([0]), rider_y=np.array([5.0]))
+    >>> s.tolist(), w.tolist()
+    ([1], [0])
+    """
+    rule = get_rule(rule)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    wave_x = np.asarray(wave_x, dtype=np.float64)
+    rider_wave = np.asarray(rider_wave, dtype=np.int64)
+    rider_y = np.asarray(rider_y, dtype=np.float64)
+    peak = np.zeros(len(x), dtype=np.int64) if peak is None else np.asarray(peak, dtype=np.int64)
+    peak_y = np.full(len(x), float(PEAK_Y)) if peak_y is None else np.asarray(peak_y, dtype=np.float64)
+    queue_time = np.full(len(x), np.nan) if queue_time is None else np.asarray(queue_time, dtype=np.float64)
+    rider_peak = np.zeros(len(rider_y), dtype=np.int64) if rider_peak is None else np.asarray(rider_peak, dtype=np.int64)
+
+    surfer, wave = candidate_pairs(x, wave_x)
+    if len(surfer) == 0:
+        return surfer, wave
+
+    # lineup groups: one per (wave, peak)
+    n_peaks = int(max(peak.max(initial=0), rider_peak.max(initial=0))) + 1
+    peak_positions = np.full(n_peaks, float(PEAK_Y))
+    peak_positions[peak] = peak_y
+
+    candidates = {
+        "surfer": surfer,
+        "wave": wave,
+        "x": x,
+        "y": y,
+        "peak": peak,
+        "peak_y": peak_y,
+        "queue_time": queue_time,
+        "wave_x": wave_x,
+        "rider_wave": rider_wave,
+        "rider_y": rider_y,
+        "rider_peak": rider_peak,
+        "rider_peak_y": peak_positions[rider_peak],
+        "group": wave * n_peaks + peak[surfer],
+        "rider_group": rider_wave * n_peaks + rider_peak,
+        "n_groups": len(wave_x) * n_peaks,
+    }
+    allowed = rule.allowed(candidates)
+    return surfer[allowed], wave[allowed]
+
+def benchmark_rules(n_surfers=2000, n_waves=20, n_riders=200, repeats=20, seed=0):
+    """
+    Time one tick's decision of every registered rule on a synthetic lineup.
+
+    :param n_surfers: number of waiting surfers
+    :param n_waves: number of active waves
+    :param n_riders: number of surfers already on the waves
+    :param repeats: timed repetitions per rule
+    :param seed: seed of the synthetic lineup
+    :return: dictionary mapping rule name to (mean seconds per tick, number of permitted pairs)
+    """
+    rng = np.random.RandomState(seed)
+    n_peaks = len(BEACH_CONF["peaks"])
+    centers = np.array([p["y"] for p in BEACH_CONF["peaks"]], dtype=float)
+
+    peak = rng.randint(n_peaks, size=n_surfers)
+    lineup = {
+        "x": rng.uniform(BP_X_MIN, BP_X_MAX, size=n_surfers),
+        "y": centers[peak] + rng.uniform(-60, 60, size=n_surfers),
+        "wave_x": rng.uniform(BP_X_MIN, BP_X_MAX, size=n_waves),
+        "rider_wave": rng.randint(n_waves, size=n_riders),
+        "rider_y": rng.uniform(BEACH_CONF["y_min"], BEACH_CONF["y_max"], size=n_riders),
+        "peak": peak,
+        "peak_y": centers[peak],
+        "queue_time": np.where(rng.rand(n_surfers) < 0.2, np.nan, rng.uniform(0, SESSION_DURATION, size=n_surfers)),
+    }
+    lineup["rider_peak"] = np.abs(lineup["rider_y"][:, None] - centers[None, :]).argmin(axis=1)
+
+    timings = {}
+    for name in sorted(RULES):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            surfer, _ = permitted_pairs(name, **lineup)
+        timings[name] = ((time.perf_counter() - start) / repeats, len(surfer))
+    return timings
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark one tick of every registered lineup rule.")
+    parser.add_argument("--surfers", type=int, default=2000, help="waiting surfers")
+    parser.add_argument("--waves", type=int, default=20, help="active waves")
+    parser.add_argument("--riders", type=int, default=200, help="surfers already riding")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rule':<22}{'ms/tick':>10}{'permitted':>11}")
+    for name, (seconds, n_permitted) in benchmark_rules(args.surfers, args.waves, args.riders, args.repeats).items():
+        print(f"{name:<22}{seconds * 1000:>10.3f}{n_permitted:>11}")
@@ -0,0 +1,337 @@
+"""
+Global sensitivity analysis of the simulation over SPOT_CONF parameters.
+
+A design follows the Saltelli scheme: two Latin-hypercube matrices A and B over the
+declared parameter ranges, plus one matrix AB_i per parameter (A with column i taken
+from B). Every design point is one run_simulation configuration. First-order indices
+use the Saltelli (2010) estimator and total-effect indices the Jansen estimator.
+
+Designs are drawn in fixed-size blocks seeded by (seed, block), so a larger n_base
+reproduces the points of a smaller one; with a cache file only the new points run.
+"""
+import copy
+import hashlib
+import json
+import os
+import pandas as pd
+
+from src.simulation import *
+from src.executors import ProcessPoolBackend, SerialBackend
+
+# Outputs analysed by default (n_surfers and wave_counts are inputs, not responses)
+SENSITIVITY_METRICS = ["avg_success_count", "avg_collision_count", "avg_waiting_time", "fairness"]
+
+def latin_hypercube(n, d, rng=None):
+    """
+    Draw a Latin hypercube sample: each column has exactly one point per 1/n stratum.
+
+    :param n: number of points
+    :param d: number of dimensions
+    :param rng: random stream to draw from (defaults to the global numpy stream)
+    :return: array of shape (n, d) with values in [0, 1)
+    >>> u = latin_hypercube(5, 2, np.random.RandomState(0))
+    >>> u.shape
+    (5, 2)
+    >>> sorted((u[:, 1] * 5).astype(int).tolist())
+    [0, 1, 2, 3, 4]
+    """
+    if rng is None:
+        rng = np.random
+
+    u = (rng.rand(n, d) + np.arange(n)[:, None]) / n
+    for j in range(d):
+        u[:, j] = u[rng.permutation(n), j]
+    return u
+
+def get_param(spot_conf, name):
+    """
+    Read a parameter from a spot configuration by its dotted name.
+
+    An entry with 'min' and 'max' can also be read as its 'center' and 'width'.
+
+    :param spot_conf: spot configuration dictionary
+    :param name: parameter path such as 'wave_height.mu'; 'alpha_success' falls back to ALPHA_SUCCESS
+    :return: the parameter value
+    >>> get_param(SPOT_CONF["mixed"], "wave_height.sigma")
+    0.35
+    >>> get_param(SPOT_CONF["mixed"], "alpha_success") == ALPHA_SUCCESS
+    True
+    >>> get_param(SPOT_CONF["mixed"], "wave_speed.center"), get_param(SPOT_CONF["mixed"], "wave_speed.width")
+    (4.5, 2.0)
+    """
+    if name == "alpha_success":
+        return spot_conf.get("alpha_success", ALPHA_SUCCESS)
+
+    *parents, leaf = name.split(".")
+    value = spot_conf
+    for part in parents:
+        value = value[part]
+    if leaf == "center":
+        return (value["min"] + value["max"]) / 2
+    if leaf == "width":
+        return value["max"] - value["min"]
+    return value[leaf]
+
+def apply_params(spot_conf, params):
+    """
+    Return a copy of a spot configuration with the given parameters replaced.
+
+    Setting the 'center' of a min/max entry keeps its width and the other way round.
+
+    :param spot_conf: base spot configuration dictionary
+    :param params: dictionary mapping dotted parameter names to values
+    :return: a new spot configuration dictionary
+    >>> conf = apply_params(SPOT_CONF["beginner"], {"skill.alpha": 3.0, "alpha_success": 0.5})
+    >>> conf["skill"], conf["alpha_success"]
+    ({'alpha': 3.0, 'beta': 8.0}, 0.5)
+    >>> SPOT_CONF["beginner"]["skill"]["alpha"]
+    2.0
+    >>> apply_params(SPOT_CONF["beginner"], {"wave_speed.center": 4.0, "wave_speed.width": 1.0})["wave_speed"]
+    {'min': 3.5, 'max': 4.5}
+    >>> apply_params(SPOT_CONF["beginner"], {"wave_speed.min": 5.0})
+    Traceback (most recent call last):
+        ...
+    ValueError: wave_speed.min exceeds wave_speed.max
+    """
+    conf = copy.deepcopy(spot_conf)
+    for name, value in params.items():
+        *parents, leaf = name.split(".")
+        target = conf
+        for part in parents:
+            target = target[part]
+        if leaf == "center":
+            half_width = (target["max"] - target["min"]) / 2
+            target["min"], target["max"] = float(value) - half_width, float(value) + half_width
+        elif leaf == "width":
+            center = (target["min"] + target["max"]) / 2
+            target["min"], target["max"] = center - float(value) / 2, center + float(value) / 2
+        else:
+            target[leaf] = float(value)
+
+        if target.get("min", -np.inf) > target.get("max", np.inf):
+            prefix = ".".join(parents)
+            raise ValueError(f"{prefix}.min exceeds {prefix}.max")
+    return conf
+
+def default_ranges(spot_conf, names=None, spread=SENSITIVITY_SPREAD):
+    """
+    Build parameter ranges of +/- spread around the base values of a spot configuration.
+
+    :param spot_conf: base spot configuration dictionary
+    :param names: parameter names (defaults to SENSITIVITY_PARAMS)
+    :param spread: relative half-width of each range
+    :return: dictionary mapping names to (low, high)
+    >>> default_ranges(SPOT_CONF["beginner"], ["lambda_set", "wave_height.mu"])
+    {'lambda_set': (2.625, 4.375), 'wave_height.mu': (-0.625, -0.375)}
+    """
+    if names is None:
+        names = SENSITIVITY_PARAMS
+
+    ranges = {}
+    for name in names:
+        base = get_param(spot_conf, name)
+        ranges[name] = (base - spread * abs(base), base + spread * abs(base))
+    return ranges
+
+def saltelli_design(ranges, n_base, seed=0, block_size=16):
+    """
+    Build a Saltelli design of n_base rows, each contributing len(ranges) + 2 points.
+
+    :param ranges: dictionary mapping parameter names to (low, high)
+    :param n_base: number of base rows; must be a multiple of block_size
+    :param seed: seed of the design
+    :param block_size: rows drawn per Latin-hypercube block
+    :return: DataFrame with columns 'row', 'matrix' and one column per parameter
+    >>> design = saltelli_design({"lambda_set": (3, 4), "skill.alpha": (1, 2)}, 4, block_size=2)
+    >>> len(design), sorted(design["matrix"].unique())
+    (16, ['A', 'AB_lambda_set', 'AB_skill.alpha', 'B'])
+    >>> bigger = saltelli_design({"lambda_set": (3, 4), "skill.alpha": (1, 2)}, 6, block_size=2)
+    >>> bigger.iloc[:16].equals(design)
+    True
+    """
+    if n_base % block_size:
+        raise ValueError("n_base must be a multiple of block_size")
+
+    names = list(ranges)
+    d = len(names)
+    lows = np.array([ranges[name][0] for name in names], dtype=float)
+    highs = np.array([ranges[name][1] for name in names], dtype=float)
+
+    records = []
+    for block in range(n_base // block_size):
+        rng = make_streams([seed, block], 1)[0]
+        u = latin_hypercube(block_size, 2 * d, rng)
+        a = lows + u[:, :d] * (highs - lows)
+        b = lows + u[:, d:] * (highs - lows)
+
+        for k in range(block_size):
+            row = block * block_size + k
+            records.append({"row": row, "matrix": "A", **dict(zip(names, a[k]))})
+            records.append({"row": row, "matrix": "B", **dict(zip(names, b[k]))})
+            for i, name in enumerate(names):
+                ab = a[k].copy()
+                ab[i] = b[k, i]
+                records.append({"row": row, "matrix": f"AB_{name}", **dict(zip(names, ab))})
+
+    return pd.DataFrame(records, columns=["row", "matrix"] + names)
+
+def sobol_indices(y_a, y_b, y_ab):
+    """
+    Estimate first-order (S1) and total-effect (ST) indices from Saltelli outputs.
+
+    :param y_a: outputs at the A points, shape (N,)
+    :param y_b: outputs at the B points, shape (N,)
+    :param y_ab: outputs at the AB_i points, shape (N, d)
+    :return: tuple of arrays (S1, ST), each of length d; NaN if the output does not vary
+    >>> rng = np.random.RandomState(1)
+    >>> a, b = rng.rand(2000, 2), rng.rand(2000, 2)
+    >>> ab = np.stack([np.where(np.arange(2) == i, b, a) for i in range(2)], axis=1)
+    >>> f = lambda x: 3 * x[..., 0]
+    >>> s1, st = sobol_indices(f(a), f(b), f(ab))
+    >>> np.round(s1, 1).tolist(), np.round(st, 1).tolist()
+    ([1.0, 0.0], [1.0, 0.0])
+    """
+    y_a = np.asarray(y_a, dtype=float)
+    y_b = np.asarray(y_b, dtype=float)
+    y_ab = np.asarray(y_ab, dtype=float)
+
+    var = np.var(np.concatenate([y_a, y_b]))
+    if var == 0:
+        nan = np.full(y_ab.shape[1], np.nan)
+        return nan, nan.copy()
+
+    s1 = np.mean(y_b[:, None] * (y_ab - y_a[:, None]), axis=0) / var
+    st = 0.5 * np.mean((y_a[:, None] - y_ab) ** 2, axis=0) / var
+    return s1, st
+
+def point_key(params, seed, runs_per_point, sim_kwargs):
+    """
+    Cache key of one design point: its parameters, seed and simulation settings.
+
+    >>> point_key({"lambda_set": 3.5}, [0, 1], 1, {}) == point_key({"lambda_set": 3.5}, [0, 1], 1, {})
+    True
+    >>> point_key({"lambda_set": 3.5}, [0, 1], 1, {}) == point_key({"lambda_set": 3.5}, [0, 2], 1, {})
+    False
+    """
+    payload = json.dumps(
+        {"params": params, "seed": seed, "runs": runs_per_point, "sim": sim_kwargs},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def evaluate_point(task):
+    """
+    Run one design point (averaging runs_per_point seeded replicates).
+
+    :param task: tuple (key, spot_conf, sim_kwargs, seed, runs_per_point)
+    :return: tuple (key, dictionary of averaged METRICS)
+    """
+    key, spot_conf, sim_kwargs, seed, runs_per_point = task
+    rows = [run_simulation(spot_conf=spot_conf, seed=[*seed, r], **sim_kwargs) for r in range(runs_per_point)]
+    return key, {metric: float(np.mean([row[metric] for row in rows])) for metric in METRICS}
+
+def load_cache(cache_path):
+    """
+    Load cached point results from a JSON-lines file.
+
+    :param cache_path: path of the cache file (may not exist yet)
+    :return: dictionary mapping point keys to metric dictionaries
+    """
+    cache = {}
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    cache[entry["key"]] = entry["metrics"]
+    return cache
+
+def run_sensitivity(
+        ranges=None,
+        n_base=64,
+        spot_level=SPOT_LEVEL,
+        spot_conf=None,
+        metrics=None,
+        seed=0,
+        runs_per_point=1,
+        cache_path=None,
+        max_workers=None,
+        block_size=16,
+        backend=None,
+        **sim_kwargs,
+):
+    """
+    Run a Saltelli design through run_simulation and compute Sobol indices.
+
+    All points of a design row share the seed (seed, row), so the differences between
+    A and AB_i are not inflated by independent sampling noise.
+
+    :param ranges: dictionary mapping parameter names to (low, high); defaults to
+        default_ranges(spot_conf)
+    :param n_base: number of base rows (the design has n_base * (d + 2) points)
+    :param spot_level: the difficulty level of the spot
+    :param spot_conf: base spot configuration (defaults to SPOT_CONF[spot_level])
+    :param metrics: outputs to analyse (defaults to SENSITIVITY_METRICS)
+    :param seed: seed of the design and of the simulation runs
+    :param runs_per_point: seeded replicates averaged at every point
+    :param cache_path: JSON-lines file of finished points; reused and extended across calls
+    :param max_workers: worker processes (None = all cores, 1 = run in this process)
+    :param block_size: rows drawn per Latin-hypercube block
+    :param backend: job backend from src.executors (overrides max_workers)
+    :param sim_kwargs: further run_simulation keyword arguments (mode, duration, num_surfer, ...)
+    :return: (design DataFrame with metric columns, {metric: DataFrame of S1 and ST per parameter})
+    """
+    if spot_conf is None:
+        spot_conf = SPOT_CONF[spot_level]
+    if ranges is None:
+        ranges = default_ranges(spot_conf)
+    if metrics is None:
+        metrics = SENSITIVITY_METRICS
+    sim_kwargs = {"spot_level": spot_level, **sim_kwargs}
+
+    names = list(ranges)
+    design = saltelli_design(ranges, n_base, seed, block_size)
+    cache = load_cache(cache_path)
+
+    keys = []
+    tasks = []
+    pending = set()
+    for record in design.to_dict("records"):
+        params = {name: float(record[name]) for name in names}
+        point_seed = [seed, int(record["row"])]
+        key = point_key({"base": spot_conf, **params}, point_seed, runs_per_point, sim_kwargs)
+        keys.append(key)
+        if key not in cache and key not in pending:
+            pending.add(key)
+            tasks.append((key, apply_params(spot_conf, params), sim_kwargs, point_seed, runs_per_point))
+
+    print(f" Running {len(tasks)} new design points ({len(design) - len(tasks)} cached)...")
+
+    def record_results(results):
+        cache_file = open(cache_path, "a") if cache_path is not None else None
+        try:
+            for key, values in results:
+                cache[key] = values
+                if cache_file is not None:
+                    cache_file.write(json.dumps({"key": key, "metrics": values}) + "\n")
+                    cache_file.flush()
+        finally:
+            if cache_file is not None:
+                cache_file.close()
+
+    if backend is None:
+        workers = max_workers or os.cpu_count() or 1
+        backend = SerialBackend() if workers == 1 else ProcessPoolBackend(workers, batch_size=max(1, len(tasks) // (4 * workers)))
+    record_results(backend.map(evaluate_point, tasks))
+
+    for metric in metrics:
+        design[metric] = [cache[key][metric] for key in keys]
+
+    indices = {}
+    for metric in metrics:
+        table = design.pivot(index="row", columns="matrix", values=metric)
+        y_ab = table[[f"AB_{name}" for name in names]].to_numpy()
+        s1, st = sobol_indices(table["A"].to_numpy(), table["B"].to_numpy(), y_ab)
+        indices[metric] = pd.DataFrame({"S1": s1, "ST": st}, index=names)
+
+    return design, indices
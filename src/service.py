@@ -0,0 +1,334 @@
+"""
+Local HTTP/JSON service answering "what if" lineup questions.
+
+POST /run_many with a JSON body such as
+
+    {"spot_level": "mixed", "rule_type": "safe_distance", "num_surfer": 60, "number_of_runs": 50}
+
+streams newline-delimited JSON: one {"run": i, ...metrics} line per finished replicate
+(in completion order), then a final {"summary": {"mean": ..., "std": ...}} line.
+GET /stats reports cache and coalescing counters.
+
+Requests are keyed on their normalized configuration. Identical requests in flight share
+one computation, finished computations are kept in a bounded LRU cache, and replicates run
+on a process pool so the event loop stays responsive. Requests without a seed use seed 0,
+so a configuration always maps to the same answer (the rows of run_many(seed=0)).
+
+Start the service with:
+
+    python -m src.service --port 8765
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.simulation import *
+
+# Request fields accepted by /run_many and their defaults
+REQUEST_DEFAULTS = {
+    "mode": EXPR_CONF["mode"],
+    "spot_level": SPOT_LEVEL,
+    "rule_type": RULE_TYPE,
+    "num_surfer": None,
+    "ratio": None,
+    "duration": SESSION_DURATION,
+    "number_of_runs": 30,
+    "seed": 0,
+}
+# Upper bounds of a single request, so one request cannot occupy the service for hours
+MAX_NUMBER_OF_RUNS = 1000
+MAX_DURATION = 4 * SESSION_DURATION
+
+def is_number(value):
+    """Whether value is a JSON number (booleans excluded)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def is_integer(value):
+    """Whether value is a JSON integer (booleans excluded)."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def normalize_request(params):
+    """
+    Fill in defaults and validate a /run_many request.
+
+    :param params: dictionary parsed from the request body
+    :return: tuple (cache key, normalized request dictionary)
+    >>> key, request = normalize_request({"spot_level": "advanced", "number_of_runs": 5})
+    >>> request["rule_type"], request["seed"]
+    ('free_for_all', 0)
+    >>> normalize_request({"number_of_runs": 5, "spot_level": "advanced"})[0] == key
+    True
+    >>> normalize_request({"spot_level": "reef"})
+    Traceback (most recent call last):
+        ...
+    ValueError: unknown spot_level: 'reef'
+    >>> normalize_request({"spot_level": ["x"]})
+    Traceback (most recent call last):
+        ...
+    ValueError: unknown spot_level: ['x']
+    >>> normalize_request({"mode": "experiment"})
+    Traceback (most recent call last):
+        ...
+    ValueError: experiment mode requires ratio (beginner_ratio) between 0 and 1
+    >>> normalize_request({"num_surfer": "many"})
+    Traceback (most recent call last):
+        ...
+    ValueError: num_surfer must be a positive integer or null
+    >>> normalize_request({"number_of_runs": 10 ** 6})
+    Traceback (most recent call last):
+        ...
+    ValueError: number_of_runs must be an integer between 1 and 1000
+    >>> normalize_request({"seed": -1})
+    Traceback (most recent call last):
+        ...
+    ValueError: seed must be a non-negative integer
+    >>> normalize_request({"rule_type": "free-for-all"})  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+        ...
+    ValueError: unknown rule_type: 'free-for-all' (choose from ...)
+    """
+    if not isinstance(params, dict):
+        raise ValueError("request body must be a JSON object")
+    unknown = set(params) - set(REQUEST_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown fields: {sorted(unknown)}")
+
+    request = {**REQUEST_DEFAULTS, **params}
+    if not isinstance(request["spot_level"], str) or request["spot_level"] not in SPOT_CONF:
+        raise ValueError(f"unknown spot_level: {request['spot_level']!r}")
+    get_rule(request["rule_type"])
+    if request["mode"] == "realistic":
+        request["ratio"] = None
+    elif request["mode"] == "experiment":
+        if not is_number(request["ratio"]) or not 0 <= request["ratio"] <= 1:
+            raise ValueError("experiment mode requires ratio (beginner_ratio) between 0 and 1")
+    else:
+        raise ValueError(f"unknown mode: {request['mode']!r}")
+    if request["num_surfer"] is not None and (not is_integer(request["num_surfer"]) or request["num_surfer"] < 1):
+        raise ValueError("num_surfer must be a positive integer or null")
+    if not is_integer(request["duration"]) or not 1 <= request["duration"] <= MAX_DURATION:
+        raise ValueError(f"duration must be an integer between 1 and {MAX_DURATION}")
+    if not is_integer(request["number_of_runs"]) or not 1 <= request["number_of_runs"] <= MAX_NUMBER_OF_RUNS:
+        raise ValueError(f"number_of_runs must be an integer between 1 and {MAX_NUMBER_OF_RUNS}")
+    if not is_integer(request["seed"]) or request["seed"] < 0:
+        raise ValueError("seed must be a non-negative integer")
+
+    return json.dumps(request, sort_keys=True), request
+
+class Computation:
+    """
+    A run_many computation whose rows can be followed by several clients while it runs.
+
+    Attributes:
+        rows (list): Metric rows received so far, in completion order.
+        summary (dict): Mean and standard deviation of the metrics once finished.
+        error (str): Error message if the computation failed.
+        done (bool): Whether the computation has finished.
+    """
+    def __init__(self):
+        self.rows = []
+        self.summary = None
+        self.error = None
+        self.done = False
+        self.changed = asyncio.Condition()
+
+    async def add(self, row):
+        async with self.changed:
+            self.rows.append(row)
+            self.changed.notify_all()
+
+    async def finish(self, summary=None, error=None):
+        async with self.changed:
+            self.summary = summary
+            self.error = error
+            self.done = True
+            self.changed.notify_all()
+
+    async def follow(self):
+        """Yield every row, waiting for new ones until the computation is done."""
+        sent = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: len(self.rows) > sent or self.done)
+                new_rows = self.rows[sent:]
+                finished = self.done
+            for row in new_rows:
+                yield row
+            sent += len(new_rows)
+            if finished and sent == len(self.rows):
+                return
+
+class SimulationService:
+    """
+    Coalescing, caching front end to run_task.
+
+    Attributes:
+        cache (OrderedDict): Finished computations by request key, least recently used first.
+        inflight (dict): Running computations by request key.
+        tasks (set): asyncio tasks of the running computations, referenced so they are not garbage-collected.
+        counters (Counter): Number of 'computed', 'coalesced' and 'cache_hits' requests.
+        max_pending (int): Replicates of one request submitted to the pool at a time.
+    """
+    def __init__(self, max_workers=None, cache_size=128, max_pending=None):
+        self.cache_size = cache_size
+        # a few more than the workers keep the pool busy while other requests still get a turn
+        self.max_pending = max_pending or 2 * (max_workers or os.cpu_count() or 1)
+        self.cache = OrderedDict()
+        self.inflight = {}
+        self.tasks = set()
+        self.counters = Counter()
+        # spawned (not forked) workers, so they do not inherit open client sockets
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, params):
+        """
+        Return the computation answering a request, starting one only if needed.
+
+        :param params: dictionary parsed from the request body
+        :return: a Computation
+        """
+        key, request = normalize_request(params)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.counters['cache_hits'] += 1
+            return self.cache[key]
+        if key in self.inflight:
+            self.counters['coalesced'] += 1
+            return self.inflight[key]
+
+        self.counters['computed'] += 1
+        computation = Computation()
+        self.inflight[key] = computation
+        task = asyncio.get_running_loop().create_task(self.compute(key, request, computation))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return computation
+
+    async def compute(self, key, request, computation):
+        """Run the replicates of a request on the pool and publish rows as they finish."""
+        loop = asyncio.get_running_loop()
+        kwargs = {name: request[name] for name in ("mode", "spot_level", "rule_type", "num_surfer", "ratio", "duration")}
+
+        pending = iter(range(request["number_of_runs"]))
+
+        async def runner():
+            # runners share the pending iterator, so at most max_pending replicates are submitted at once
+            for i in pending:
+                task = {"kwargs": kwargs, "seed": [request["seed"], i]}
+                row = await loop.run_in_executor(self.pool, run_task, task)
+                await computation.add({"run": i, **row})
+
+        runners = [asyncio.ensure_future(runner()) for _ in range(min(self.max_pending, request["number_of_runs"]))]
+        try:
+            await asyncio.gather(*runners)
+        except Exception as e:
+            # stop the other runners and wait for their running replicates
+            for task in runners:
+                task.cancel()
+            await asyncio.gather(*runners, return_exceptions=True)
+            del self.inflight[key]
+            await computation.finish(error=f"{type(e).__name__}: {e}")
+            return
+
+        df = pd.DataFrame(sorted(computation.rows, key=lambda row: row["run"])).drop(columns="run")
+        summary = {"mean": df.mean().to_dict(), "std": df.std().fillna(0.0).to_dict()}
+
+        del self.inflight[key]
+        self.cache[key] = computation
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        await computation.finish(summary=summary)
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP/1.1 request."""
+        try:
+            try:
+                method, path, _ = (await reader.readline()).decode().split()
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode()
+                    if line in ("\r\n", "\n", ""):
+                        break
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                await self.respond(writer, 400, {"error": "malformed HTTP request"})
+                return
+            body = await reader.readexactly(length)
+
+            if method == "GET" and path == "/stats":
+                stats = {**self.counters, "cached": len(self.cache), "inflight": len(self.inflight)}
+                await self.respond(writer, 200, stats)
+            elif method == "POST" and path == "/run_many":
+                try:
+                    computation = self.submit(json.loads(body or b"{}"))
+                except ValueError as e:
+                    await self.respond(writer, 400, {"error": str(e)})
+                    return
+                await self.stream(writer, computation)
+            else:
+                await self.respond(writer, 404, {"error": f"no route for {method} {path}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload):
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def stream(self, writer, computation):
+        """Send a computation's rows as a chunked NDJSON response."""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+
+        async def send(payload):
+            line = json.dumps(payload).encode() + b"\n"
+            writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            await writer.drain()
+
+        async for row in computation.follow():
+            await send(row)
+        await send({"error": computation.error} if computation.error else {"summary": computation.summary})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """Start listening; returns the asyncio server."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+async def main(host, port, max_workers, cache_size):
+    service = SimulationService(max_workers, cache_size)
+    server = await service.serve(host, port)
+    print(f"Serving on http://{host}:{port} (POST /run_many, GET /stats)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve run_many over local HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--cache-size", type=int, default=128, help="finished requests kept in the LRU cache")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.host, args.port, args.workers, args.cache_size))
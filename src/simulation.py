@@ -1,6 +1,32 @@
+import json
 import pandas as pd
+from statistics import NormalDist
 from src.surfer import *
 from src.wave import *
+from src.metrics import MetricsAccumulator
+from src.rules import RULES, get_rule
+from src.executors import SerialBackend
+
+# Per-run metrics collected by run_many and compared by run_paired
+METRICS = ["n_surfers", "wave_counts", "avg_success_count", "avg_collision_count", "avg_waiting_time", "fairness"]
+
+def make_streams(seed, n):
+    """
+    Derive n independent random streams from a seed.
+
+    :param seed: an int, a sequence of ints, or a numpy SeedSequence
+    :param n: the number of streams to create
+    :return: a list of numpy RandomState objects
+    >>> a = make_streams(7, 2)
+    >>> b = make_streams(7, 2)
+    >>> a[0].rand() == b[0].rand()
+    True
+    >>> a[1].rand() == a[0].rand()
+    False
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.RandomState(np.random.MT19937(child)) for child in seed.spawn(n)]
 
 # AI logic check - 3
 def gini(x):
@@ -40,12 +66,13 @@ def gini(x):
 
     return float(diff_sum / (2 * n ** 2 * mean_x))
 
-def simulate_waves(duration, spot_conf):
+def simulate_waves(duration, spot_conf, rng=None):
     """
     Generate a schedule of waves for the simulation session based on spot configuration.
 
     :param duration: the total duration of simulation (sec)
     :param spot_conf: dictionary containing spot configuration
+    :param rng: random stream to draw from (defaults to the global numpy stream)
     :return: a list of wave dictionaries containing spawn time, height, speed, and status
     >>> from src.config import SPOT_CONF
     >>> simulate_waves(0.0, SPOT_CONF["beginner"])
@@ -68,6 +95,8 @@ def simulate_waves(duration, spot_conf):
     """
     if not spot_conf:
         return []
+    if rng is None:
+        rng = np.random
 
     wave_schedule = []
     t = 0
@@ -75,17 +104,17 @@ def simulate_waves(duration, spot_conf):
 
     while t < duration:
         # next wave set generation time
-        delta_t = np.random.gamma(WAVESET_ARRIVAL['shape'], WAVESET_ARRIVAL['scale'])
+        delta_t = rng.gamma(WAVESET_ARRIVAL['shape'], WAVESET_ARRIVAL['scale'])
         t += delta_t
         if t > duration:
             break
 
         # wave count in a set
-        num_waves = np.random.poisson(lambda_wavecount)
+        num_waves = rng.poisson(lambda_wavecount)
 
         # generate waves in a set
         for i in range(num_waves):
-            offset = np.random.uniform(3, 8)
+            offset = rng.uniform(3, 8)
 
             spawn_time = t + offset
             if spawn_time >= duration:
@@ -97,19 +126,19 @@ def simulate_waves(duration, spot_conf):
             h_min = wave_height_settings['min']
             h_avg = wave_height_settings['mu']
             h_sigma = wave_height_settings['sigma']
-            h = np.random.lognormal(h_avg, h_sigma)
+            h = rng.lognormal(h_avg, h_sigma)
             height = min(max(h, h_min), h_max)
 
             # handle wave speed
             s_min = spot_conf['wave_speed']['min']
             s_max = spot_conf['wave_speed']['max']
-            session_base_speed = np.random.uniform(s_min, s_max)
+            session_base_speed = rng.uniform(s_min, s_max)
 
             wave_schedule.append({'spawn_time': spawn_time, 'height': height, 'speed': session_base_speed, 'spawned': False})
     return wave_schedule
 
 # AI idea check - 1
-def prep_surfer_config(spot_level, mode, ratio, num_surfer):
+def prep_surfer_config(spot_level, mode, ratio, num_surfer, rng=None, spot_conf=None):
     """
     Prepare the surfer configuration dictionary, including skill levels and counts.
 
@@ -117,6 +146,9 @@ def prep_surfer_config(spot_level, mode, ratio, num_surfer):
     :param mode: simulation mode ('realistic', 'experiment')
     :param ratio: ratio of beginner surfers
     :param num_surfer: the total number of surfers
+    :param rng: random stream to draw from (defaults to the global numpy stream)
+    :param spot_conf: custom spot configuration; its 'num_surfer' and 'skill' entries
+        override those of spot_level
     :return: a dictionary containing initialized surfer configuration
     >>> from src.config import SPOT_CONF
     >>> s_config = prep_surfer_config("beginner", "realistic", None, None)
@@ -134,19 +166,23 @@ def prep_surfer_config(spot_level, mode, ratio, num_surfer):
     True
     """
 
+    if rng is None:
+        rng = np.random
+    crowd_conf = {**SPOT_CONF[spot_level], **(spot_conf or {})}
+
     config = {}
 
     if mode == "realistic":
         # decide number of surfers
-        mean = SPOT_CONF[spot_level]["num_surfer"]["mean"]
-        std = SPOT_CONF[spot_level]["num_surfer"]["std"]
+        mean = crowd_conf["num_surfer"]["mean"]
+        std = crowd_conf["num_surfer"]["std"]
         if num_surfer is None:
-            num_surfer = max(10, min(int(np.random.normal(mean, std)), 150))
+            num_surfer = max(10, min(int(rng.normal(mean, std)), 150))
 
         # decide skill distribution
-        alpha = SPOT_CONF[spot_level]["skill"]["alpha"]
-        beta = SPOT_CONF[spot_level]["skill"]["beta"]
-        skills = np.random.beta(alpha, beta, size=num_surfer)
+        alpha = crowd_conf["skill"]["alpha"]
+        beta = crowd_conf["skill"]["beta"]
+        skills = rng.beta(alpha, beta, size=num_surfer)
 
         config["skills"] = skills
         config["num_surfer"] = num_surfer
@@ -162,14 +198,14 @@ def prep_surfer_config(spot_level, mode, ratio, num_surfer):
 
         # skill distribution
         b_low, b_high = EXPR_CONF["beginner_params"]
-        beginner = np.random.uniform(b_low, b_high, size=n_beginner)
+        beginner = rng.uniform(b_low, b_high, size=n_beginner)
 
         a_low, a_high = EXPR_CONF["advanced_params"]
-        advanced = np.random.uniform(a_low, a_high, size=n_advanced)
+        advanced = rng.uniform(a_low, a_high, size=n_advanced)
 
         # merge and shuffle
         skills = np.concatenate((beginner, advanced))
-        np.random.shuffle(skills)
+        rng.shuffle(skills)
 
         config["skills"] = skills
         config["num_surfer"] = num_surfer
@@ -178,42 +214,189 @@ def prep_surfer_config(spot_level, mode, ratio, num_surfer):
 
     return config
 
-def compute_stats(surfers: list, wave_schedule: list, spot_level: str, ratio: float) -> dict:
+def summarize(success, collisions, waiting_time_sum, wave_counts, spot_level, ratio):
     """
-    Computes statistics for the simulation.
+    Computes statistics from per-surfer counter arrays.
 
-    :param surfers: a list of surfer statistics
-    :param wave_schedule: a list of wave configurations
+    :param success: success count of each surfer
+    :param collisions: collision count of each surfer
+    :param waiting_time_sum: summed waiting time of each surfer
+    :param wave_counts: number of waves in the session
     :param spot_level: the difficulty level of the spot
     :param ratio: ratio of beginner surfers
     :return: dictionary of stats
-    >>> compute_stats([], [], "mixed", 0.0)
-    {'spot_level': 'mixed', 'n_surfers': 0, 'beginner_ratio': 0.0, 'wave_counts': 0, 'avg_success_count': 0.0, 'avg_collision_count': 0.0, 'avg_waiting_time': 0.0, 'fairness': 0.0}
+    >>> summarize([2, 0], [1, 1], [30, 0], 4, "mixed", None)["avg_waiting_time"] == (30 + SESSION_DURATION) / 2
+    True
     """
-    success_wave_counts = [s.stats['success'] for s in surfers]  # success wave count for each person
-    fairness = gini(success_wave_counts)
-    total_collision = sum(s.stats['collisions'] for s in surfers)
-    total_success = sum(s.stats['success'] for s in surfers)
-    wait_sum = np.array([s.waiting_time_sum if s.waiting_time_sum > 0 else SESSION_DURATION for s in surfers ])
+    success = np.asarray(success, dtype=np.int64)
+    collisions = np.asarray(collisions, dtype=np.int64)
+    waiting_time_sum = np.asarray(waiting_time_sum, dtype=np.float64)
+    n = len(success)
+
+    fairness = gini(success.tolist())  # success wave count for each person
+    total_collision = int(collisions.sum())
+    total_success = int(success.sum())
+    wait_sum = np.where(waiting_time_sum > 0, waiting_time_sum, SESSION_DURATION)
 
     if total_success > 0:
         avg_wait_time = wait_sum.sum() / total_success
-    elif len(surfers) == 0:
+    elif n == 0:
         avg_wait_time = 0.0
     else:
         avg_wait_time = SESSION_DURATION
 
     return {
         "spot_level": spot_level,
-        "n_surfers": len(surfers),
+        "n_surfers": n,
         "beginner_ratio": ratio,
-        'wave_counts': len(wave_schedule),
-        'avg_success_count': total_success / len(surfers) if len(surfers) else 0.0,
-        'avg_collision_count': total_collision / len(surfers) if len(surfers) else 0.0,
+        'wave_counts': wave_counts,
+        'avg_success_count': total_success / n if n else 0.0,
+        'avg_collision_count': total_collision / n if n else 0.0,
         'avg_waiting_time': float(avg_wait_time),
         'fairness': float(fairness),
     }
 
+def compute_stats(surfers, wave_schedule: list, spot_level: str, ratio: float) -> dict:
+    """
+    Computes statistics for the simulation.
+
+    :param surfers: a MetricsAccumulator filled during the run, or a list of surfers
+        (objects with 'stats' and 'waiting_time_sum')
+    :param wave_schedule: the session's waves (a list of wave configurations or spawn times)
+    :param spot_level: the difficulty level of the spot
+    :param ratio: ratio of beginner surfers
+    :return: dictionary of stats
+    >>> compute_stats([], [], "mixed", 0.0)
+    {'spot_level': 'mixed', 'n_surfers': 0, 'beginner_ratio': 0.0, 'wave_counts': 0, 'avg_success_count': 0.0, 'avg_collision_count': 0.0, 'avg_waiting_time': 0.0, 'fairness': 0.0}
+    """
+    metrics = surfers if isinstance(surfers, MetricsAccumulator) else MetricsAccumulator.from_surfers(surfers)
+
+    return summarize(
+        metrics.success,
+        metrics.collisions,
+        metrics.waiting_time_sum,
+        len(wave_schedule),
+        spot_level,
+        ratio,
+    )
+
+def start_session(spot_level, num_surfer, ratio, spot_conf, mode, seed):
+    """
+    Reset the global trackers and create the surfers of a new session.
+
+    :param spot_level: the difficulty level of the spot
+    :param num_surfer: total number of surfers
+    :param ratio: ratio of beginner surfers
+    :param spot_conf: spot configuration dictionary
+    :param mode: simulation mode ('realistic', 'experiment')
+    :param seed: seed of the session, or None to use the global numpy stream
+    :return: tuple (MetricsAccumulator the surfers report to, random stream for the waves)
+    """
+    # Reset global trackers
+    Wave.all_waves = []
+    Surfer.all_surfers = []
+
+    # Prepare surfers
+    if mode == "realistic":
+        if ratio is not None:
+            raise ValueError("ratio is not supported for realistic mode")
+    elif mode == "experiment":
+        if ratio is None:
+            raise ValueError("experiment mode requires ratio (beginner_ratio)")
+
+    # Seeded runs draw waves, population and surfer decisions from separate streams
+    if seed is None:
+        wave_rng, crowd_rng = np.random, np.random
+    else:
+        wave_rng, crowd_rng, surfer_seed = make_streams(seed, 3)
+
+    surfer_config = prep_surfer_config(spot_level, mode, ratio, num_surfer, rng=crowd_rng, spot_conf=spot_conf)
+
+    # Create surfers, which report to the metrics accumulator as they go
+    metrics = MetricsAccumulator(len(surfer_config["skills"]))
+    alpha_success = spot_conf.get("alpha_success", ALPHA_SUCCESS)
+    if seed is None:
+        rngs = [None] * len(surfer_config["skills"])
+    else:
+        rngs = make_streams(surfer_seed.randint(2 ** 31), len(surfer_config["skills"]))
+    for s, r in zip(surfer_config["skills"], rngs):
+        Surfer(skill=s, rng=r, alpha_success=alpha_success, metrics=metrics)
+
+    return metrics, wave_rng
+
+def load_waves(duration, spot_conf, wave_schedule=None, wave_bank=None, wave_index=None, rng=None):
+    """
+    Return the session's wave schedule as columns: from a bank, as provided, or freshly generated.
+
+    :param duration: duration of the simulation in seconds
+    :param spot_conf: spot configuration dictionary
+    :param wave_schedule: a list of wave configurations
+    :param wave_bank: a WaveBank or the path of a bank file
+    :param wave_index: which schedule of wave_bank to use
+    :param rng: random stream for a generated schedule
+    :return: tuple of arrays (spawn_time, height, speed)
+    >>> spawn_time, height, speed = load_waves(60, {}, wave_schedule=[{'spawn_time': 4, 'height': 1.0, 'speed': 3}])
+    >>> spawn_time.tolist(), speed.tolist()
+    ([4.0], [3.0])
+    """
+    if wave_bank is not None:
+        if wave_schedule is not None:
+            raise ValueError("pass either wave_schedule or wave_bank, not both")
+        if wave_index is None:
+            raise ValueError("wave_bank requires wave_index")
+        if isinstance(wave_bank, str):
+            from src.wavebank import open_bank
+            wave_bank = open_bank(wave_bank)
+        if wave_bank.duration < duration:
+            raise ValueError(f"wave bank only covers {wave_bank.duration} seconds")
+        spawn_time, height, speed = wave_bank.schedule(wave_index)
+        if wave_bank.duration > duration:
+            in_session = spawn_time < duration
+            spawn_time, height, speed = spawn_time[in_session], height[in_session], speed[in_session]
+        return spawn_time, height, speed
+
+    if wave_schedule is None:
+        wave_schedule = simulate_waves(duration, spot_conf, rng=rng)
+    return tuple(np.array([w[key] for w in wave_schedule], dtype=np.float64) for key in ('spawn_time', 'height', 'speed'))
+
+def run_ticks(rule_type, waves, start, stop, metrics, until=None):
+    """
+    Advance the current session (Wave.all_waves, Surfer.all_surfers) from tick start to tick stop.
+
+    :param rule_type: the lineup rule surfers follow (a name registered in src.rules.RULES)
+    :param waves: the wave schedule as columns (spawn_time, height, speed)
+    :param start: first tick to simulate; waves due before it are taken as already spawned
+    :param stop: tick at which to stop (exclusive)
+    :param metrics: the MetricsAccumulator of the session
+    :param until: optional function called with t after every tick; the loop stops early once it returns True
+    :return: int, the first tick not simulated
+    """
+    rule = get_rule(rule_type)
+    spawn_time, height, speed = waves
+    spawn_order = np.argsort(spawn_time, kind="stable")
+    sorted_spawn_time = spawn_time[spawn_order]
+    n_spawned = np.searchsorted(sorted_spawn_time, start - 1, side="right")
+
+    for t in range(start, stop):
+
+        # spawn new waves (in schedule order) once their spawn time has passed
+        n_due = np.searchsorted(sorted_spawn_time, t, side="right")
+        for i in np.sort(spawn_order[n_spawned:n_due]):
+            Wave(height[i], speed[i])
+        n_spawned = n_due
+
+        # update waves
+        Wave.update_all()
+
+        # update surfers
+        Surfer.update_all(rule, Wave.all_waves, t)
+
+        metrics.tick(t)
+
+        if until is not None and until(t):
+            return t + 1
+    return max(start, stop)
+
 # AI logic organization -1
 def run_simulation(
         spot_level=SPOT_LEVEL,
@@ -224,18 +407,30 @@ def run_simulation(
         wave_schedule=None,
         mode=EXPR_CONF["mode"],
         duration=SESSION_DURATION,
+        seed=None,
+        timeseries=False,
+        wave_bank=None,
+        wave_index=None,
 ):
     """
     Runs a single simulation session.
 
     :param spot_level: the difficulty level of the spot
-    :param rule_type: the rule set surfers follow ('free_for_all' or 'safe_distance')
+    :param rule_type: the lineup rule surfers follow (a name registered in src.rules.RULES)
     :param num_surfer: total number of surfers
     :param ratio: ratio of beginner surfers
-    :param spot_conf: custom spot configuration dictionary
+    :param spot_conf: custom spot configuration dictionary; an optional 'alpha_success'
+        entry overrides ALPHA_SUCCESS for this run
     :param wave_schedule: a list of wave configurations
     :param mode: simulation mode ('realistic', 'experiment')
     :param duration: duration of the simulation in seconds
+    :param seed: seed for the run; runs sharing a seed share their wave schedule,
+        surfer population and per-surfer decision streams
+    :param timeseries: also return the in-loop metrics: 'timeseries' (a DataFrame sampled
+        every METRICS_SAMPLE_INTERVAL seconds) and 'waiting_time_quantiles'
+    :param wave_bank: a WaveBank (or the path of a bank file) to take the wave schedule from,
+        in place of wave_schedule
+    :param wave_index: which schedule of wave_bank to use
     :return: a dictionary containing simulation statistics
     >>> res = run_simulation(wave_schedule=[])
     >>> [res["avg_success_count"], res["avg_collision_count"], res["fairness"]]
@@ -251,50 +446,82 @@ def run_simulation(
     ValueError: experiment mode requires ratio (beginner_ratio)
     """
 
-    # Reset global trackers
-    Wave.all_waves = []
-    Surfer.all_surfers = []
-
     # Prepare spot config:
     if spot_conf is None:
         spot_conf = SPOT_CONF[spot_level]
 
-    # Prepare surfers
-    if mode == "realistic":
-        if ratio is not None:
-            raise ValueError("ratio is not supported for realistic mode")
-    elif mode == "experiment":
-        if ratio is None:
-            raise ValueError("experiment mode requires ratio (beginner_ratio)")
+    metrics, wave_rng = start_session(spot_level, num_surfer, ratio, spot_conf, mode, seed)
+    waves = load_waves(duration, spot_conf, wave_schedule, wave_bank, wave_index, wave_rng)
+    spawn_time = waves[0]
 
-    surfer_config = prep_surfer_config(spot_level, mode, ratio, num_surfer)
+    # Run simulation per second
+    run_ticks(rule_type, waves, 0, duration, metrics)
 
-    # Create surfers
-    surfers = [Surfer(skill=s) for s in surfer_config["skills"]]
+    # Compute statistics
+    stats = compute_stats(metrics, spawn_time, spot_level, ratio)
 
-    # Generate wave schedule (if not provided)
-    if wave_schedule is None:
-        wave_schedule = simulate_waves(duration, spot_conf)
+    if timeseries:
+        stats["timeseries"] = metrics.timeseries()
+        stats["waiting_time_quantiles"] = metrics.waiting_time_quantiles()
 
-    # Run simulation per second
-    for t in range(duration):
+    return stats
 
-        # spawn new waves
-        for w in wave_schedule:
-            if (not w['spawned']) and w['spawn_time'] <= t:
-                Wave(w['height'], w['speed'])
-                w['spawned'] = True
+def run_task(task):
+    """
+    Run one replicate described by a task and return its METRICS row.
 
-        # update waves
-        Wave.update_all()
+    Tasks are plain dictionaries so that any backend can ship them to a worker.
 
-        # update surfers
-        Surfer.update_all(rule_type, Wave.all_waves, t)
+    :param task: dictionary with run_simulation keyword arguments ('kwargs') and a 'seed'
+    :return: dictionary of METRICS
+    >>> row = run_task({"kwargs": {"mode": "realistic", "duration": 10, "num_surfer": 2}, "seed": [1, 0]})
+    >>> list(row) == METRICS
+    True
+    """
+    res = run_simulation(**task["kwargs"], seed=task["seed"])
+    return {key: res[key] for key in METRICS}
 
-    # Compute statistics
-    stats = compute_stats(surfers, wave_schedule, spot_level, ratio)
+def bank_kwargs(kwargs, wave_bank, index):
+    """
+    Add a wave bank reference for replicate index to run_simulation keyword arguments.
 
-    return stats
+    Banks travel as file paths, so tasks stay small and each worker maps the file itself.
+    >>> bank_kwargs({"duration": 60}, "climate.bank", 3)
+    {'duration': 60, 'wave_bank': 'climate.bank', 'wave_index': 3}
+    >>> bank_kwargs({"duration": 60}, None, 3)
+    {'duration': 60}
+    """
+    if wave_bank is None:
+        return kwargs
+    return {**kwargs, "wave_bank": getattr(wave_bank, "path", wave_bank), "wave_index": index}
+
+# spot_conf entries that simulate_waves reads
+WAVE_CONF_KEYS = ["lambda_set", "wave_height", "wave_speed"]
+
+def check_bank(wave_bank, number_of_runs, spot_conf, duration):
+    """
+    Make sure a wave bank can serve number_of_runs replicates of a configuration.
+
+    Run before any replicate starts, so a bad bank fails fast instead of part-way
+    through a batch. Only the wave settings of spot_conf have to match the bank header.
+
+    :param wave_bank: a WaveBank or the path of a bank file
+    :param number_of_runs: number of schedules needed
+    :param spot_conf: spot configuration of the replicates
+    :param duration: session duration of the replicates (sec)
+    :return: None
+    """
+    if isinstance(wave_bank, str):
+        from src.wavebank import open_bank
+        wave_bank = open_bank(wave_bank)
+    if len(wave_bank) < number_of_runs:
+        raise ValueError(f"wave bank has {len(wave_bank)} schedules, {number_of_runs} runs requested")
+    if wave_bank.duration < duration:
+        raise ValueError(f"wave bank only covers {wave_bank.duration} seconds")
+    for key in WAVE_CONF_KEYS:
+        # the header went through JSON, so compare the JSON form of the caller's settings
+        if json.loads(json.dumps(spot_conf.get(key))) != wave_bank.spot_conf.get(key):
+            raise ValueError(f"spot_conf {key} differs from the wave bank ({wave_bank.spot_conf.get(key)})")
 
 def run_many(
         number_of_runs=100,
@@ -306,42 +533,146 @@ def run_many(
         spot_conf=None,
         wave_schedule=None,
         duration=None,
+        seed=None,
+        backend=None,
+        wave_bank=None,
 ):
     """
     Run multiple Monte Carlo simulations to gather statistical distributions.
     :param number_of_runs: number of simulations to run
+    :param seed: base seed; replicate i is run with seed (seed, i) so batches are reproducible
+    :param backend: job backend from src.executors that runs the replicates (defaults to
+        running them in this process); other backends draw a base seed if none is given
+    :param wave_bank: a WaveBank or bank file path; replicate i uses its schedule i
     """
     if mode is None: mode=EXPR_CONF["mode"]
     if spot_level is None: spot_level=SPOT_LEVEL
     if rule_type is None: rule_type=RULE_TYPE
     if spot_conf is None: spot_conf=SPOT_CONF[spot_level]
     if duration is None: duration=SESSION_DURATION
+    if backend is None:
+        backend = SerialBackend()
+    elif seed is None:
+        # worker processes must not share the parent's random state
+        seed = np.random.SeedSequence().entropy
 
-    results = []
+    if wave_bank is not None:
+        check_bank(wave_bank, number_of_runs, spot_conf, duration)
+
+    kwargs = {
+        "mode": mode,
+        "spot_level": spot_level,
+        "rule_type": rule_type,
+        "num_surfer": num_surfer,
+        "ratio": ratio if mode == "experiment" else None,
+        "spot_conf": spot_conf,
+        "wave_schedule": wave_schedule,
+        "duration": duration,
+    }
+    tasks = [{"kwargs": bank_kwargs(kwargs, wave_bank, i), "seed": None if seed is None else [seed, i]}
+             for i in range(number_of_runs)]
 
     print(f" Running {number_of_runs} Monte Carlo iterations...")
 
-    for _ in range(number_of_runs):
-        res = run_simulation(
-            mode=mode,
-            spot_level=spot_level,
-            rule_type=rule_type,
-            num_surfer=num_surfer,
-            ratio=ratio if mode == "experiment" else None,
-            spot_conf=spot_conf,
-            wave_schedule=wave_schedule,
-            duration=duration,
-        )
-
-        res_metrics = {
-            "n_surfers": res["n_surfers"],
-            "wave_counts": res["wave_counts"],
-            "avg_success_count": res["avg_success_count"],
-            "avg_collision_count": res["avg_collision_count"],
-            "avg_waiting_time": res["avg_waiting_time"],
-            "fairness": res["fairness"]
-        }
-        results.append(res_metrics)
+    results = list(backend.map(run_task, tasks))
 
     df = pd.DataFrame(results)
-    return results, df.mean(), df.std()
\ No newline at end of file
+    return results, df.mean(), df.std()
+
+def paired_summary(results, confidence=0.95):
+    """
+    Summarize paired replicates as mean differences (b - a) with normal confidence intervals.
+
+    :param results: a list of rows holding 'a_<metric>', 'b_<metric>' and 'diff_<metric>' values
+    :param confidence: confidence level of the intervals
+    :return: DataFrame indexed by metric
+    >>> rows = [{"a_fairness": 0.2, "b_fairness": 0.3, "diff_fairness": 0.1},
+    ...         {"a_fairness": 0.4, "b_fairness": 0.4, "diff_fairness": 0.0}]
+    >>> table = paired_summary(rows)
+    >>> round(float(table.loc["fairness", "mean_diff"]), 3)
+    0.05
+    >>> bool(table.loc["fairness", "ci_low"] < 0.05 < table.loc["fairness", "ci_high"])
+    True
+    """
+    df = pd.DataFrame(results)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    n = len(df)
+
+    rows = {}
+    for metric in [c[len("diff_"):] for c in df.columns if c.startswith("diff_")]:
+        diff = df[f"diff_{metric}"]
+        half_width = z * diff.std() / np.sqrt(n) if n > 1 else np.nan
+        rows[metric] = {
+            "mean_a": df[f"a_{metric}"].mean(),
+            "mean_b": df[f"b_{metric}"].mean(),
+            "mean_diff": diff.mean(),
+            "std_diff": diff.std(),
+            "ci_low": diff.mean() - half_width,
+            "ci_high": diff.mean() + half_width,
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+def run_paired(
+        number_of_runs=100,
+        arm_a=None,
+        arm_b=None,
+        seed=None,
+        confidence=0.95,
+        backend=None,
+        wave_bank=None,
+        **common,
+):
+    """
+    Run a paired (common random numbers) comparison between two configurations.
+
+    Both arms of replicate i use the same seed, so they share the wave schedule, the
+    surfer population and each surfer's decision stream. The variance of the paired
+    difference then mostly reflects the effect of the changed setting rather than
+    sampling noise.
+
+    :param number_of_runs: number of paired replicates
+    :param arm_a: run_simulation keyword arguments specific to the first arm
+    :param arm_b: run_simulation keyword arguments specific to the second arm
+    :param seed: base seed; a random one is drawn if omitted
+    :param confidence: confidence level of the reported intervals
+    :param backend: job backend from src.executors that runs the replicates
+    :param wave_bank: a WaveBank or bank file path; both arms of replicate i use its schedule i
+    :param common: run_simulation keyword arguments shared by both arms
+    :return: (per-replicate rows, summary DataFrame of paired differences b - a)
+    """
+    if arm_a is None: arm_a = {"rule_type": "free_for_all"}
+    if arm_b is None: arm_b = {"rule_type": "safe_distance"}
+    if seed is None: seed = np.random.SeedSequence().entropy
+    if backend is None: backend = SerialBackend()
+
+    arms = []
+    for arm in (arm_a, arm_b):
+        kwargs = {**common, **arm}
+        kwargs.setdefault("mode", EXPR_CONF["mode"])
+        kwargs.setdefault("spot_level", SPOT_LEVEL)
+        kwargs.setdefault("rule_type", RULE_TYPE)
+        kwargs.setdefault("duration", SESSION_DURATION)
+        if kwargs.get("spot_conf") is None:
+            kwargs["spot_conf"] = SPOT_CONF[kwargs["spot_level"]]
+        if wave_bank is not None:
+            check_bank(wave_bank, number_of_runs, kwargs["spot_conf"], kwargs["duration"])
+        arms.append(kwargs)
+
+    # both arms of a replicate run back to back, so they usually land in the same batch
+    tasks = [{"kwargs": bank_kwargs(arm, wave_bank, i), "seed": [seed, i]} for i in range(number_of_runs) for arm in arms]
+
+    print(f" Running {number_of_runs} paired Monte Carlo iterations...")
+
+    rows = backend.map(run_task, tasks)
+    results = []
+    for i in range(number_of_runs):
+        res_a, res_b = next(rows), next(rows)
+
+        row = {"seed": [seed, i]}
+        for key in METRICS:
+            row[f"a_{key}"] = res_a[key]
+            row[f"b_{key}"] = res_b[key]
+            row[f"diff_{key}"] = res_b[key] - res_a[key]
+        results.append(row)
+
+    return results, paired_summary(results, confidence)
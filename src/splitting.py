@@ -0,0 +1,199 @@
+"""
+Rare-event estimation of collision probabilities by multilevel splitting.
+
+With few surfers on an advanced spot, most sessions see no collision at all, so plain
+Monte Carlo needs a very large number of runs to estimate how often one happens. Here
+the way to a collision is cut into levels of a proximity score: the distance between
+a surfing rider and the closest surfer it could collide with (see
+Surfer.check_collisions). Stage 0 runs n_per_stage sessions from a cold start until
+the score first drops below the first level, or the session ends. Every later stage
+restarts n_per_stage clones, drawn at random from the states that reached the
+previous level, with fresh random streams, and runs them to the next level. The last
+level is an actual collision.
+
+The fraction of trajectories that reach each level estimates the conditional
+probability of that level, and their product is an unbiased estimate of the
+probability of at least one collision per session (fixed-effort splitting). The whole
+procedure is repeated with independent seeds to get a confidence interval.
+"""
+from src.burnin import *
+
+WAVE_COLUMNS = ["spawn_time", "height", "speed"]
+
+def collision_score(surfers=None):
+    """
+    Distance between the closest pair of surfers that Surfer.check_collisions would compare.
+
+    A pair counts if the first surfer is surfing and the other one rides the same wave
+    or no wave at all.
+
+    :param surfers: list of surfers (defaults to Surfer.all_surfers)
+    :return: float, the smallest such distance (inf if nobody is surfing)
+    """
+    if surfers is None:
+        surfers = Surfer.all_surfers
+
+    wave_ids = {}
+    wave = np.array([-1 if s.curr_riding_wave is None else wave_ids.setdefault(id(s.curr_riding_wave), len(wave_ids))
+                     for s in surfers], dtype=np.int64)
+    surfing = np.flatnonzero([s.state == 'surfing' for s in surfers])
+    if len(surfing) == 0:
+        return float("inf")
+
+    x = np.array([s.x for s in surfers])
+    y = np.array([s.y for s in surfers])
+    dist = np.hypot(x[surfing, None] - x[None, :], y[surfing, None] - y[None, :])
+    eligible = (wave[None, :] == wave[surfing, None]) | (wave[None, :] < 0)
+    eligible[np.arange(len(surfing)), surfing] = False
+    if not eligible.any():
+        return float("inf")
+    return float(dist[eligible].min())
+
+def run_to_level(task):
+    """
+    Run one trajectory until its collision score falls below a level, or the session ends.
+
+    Tasks are plain dictionaries, so any backend can run them:
+
+    - 'kwargs': spot_level, rule_type, num_surfer, ratio, spot_conf, mode and duration
+    - 'seed': seed of this trajectory
+    - 'level': the distance to reach, or 0 for an actual collision
+    - 'start': None to start a new session, or a state returned by an earlier call
+
+    :param task: dictionary as above
+    :return: dictionary with 'reached' (bool), 'state' (the session when the level was
+        reached, as lists, else None) and 'ticks' (number of ticks simulated)
+    """
+    kwargs = task["kwargs"]
+    spot_conf = kwargs["spot_conf"]
+    start = task["start"]
+
+    if start is None:
+        metrics, wave_rng = start_session(kwargs["spot_level"], kwargs["num_surfer"], kwargs["ratio"],
+                                          spot_conf, kwargs["mode"], task["seed"])
+        waves = load_waves(kwargs["duration"], spot_conf, rng=wave_rng)
+        t = 0
+    else:
+        if start["collided"]:
+            return {"reached": True, "state": start, "ticks": 0}
+        # the wave schedule is part of the state; clones only redraw the surfers' decisions
+        waves = tuple(np.asarray(start[f"schedule_{column}"], dtype=np.float64) for column in WAVE_COLUMNS)
+        rngs = make_streams(task["seed"], len(start["surfer_state"]))
+        metrics = MetricsAccumulator(len(rngs))
+        restore_session(start, rngs, metrics, time=start["time"])
+        t = start["time"]
+
+    def collided():
+        return bool(metrics.collisions.sum() > 0)
+
+    def reached(_t=None):
+        return collided() or collision_score() < task["level"]
+
+    stop = t if reached() else run_ticks(kwargs["rule_type"], waves, t, kwargs["duration"], metrics, until=reached)
+    if not reached():
+        return {"reached": False, "state": None, "ticks": stop - t}
+
+    state = snapshot_to_lists(snapshot_session(stop))
+    state["collided"] = collided()
+    for column, values in zip(WAVE_COLUMNS, waves):
+        state[f"schedule_{column}"] = values.tolist()
+    return {"reached": True, "state": state, "ticks": stop - t}
+
+def splitting_estimate(kwargs, levels, n_per_stage, seed, backend):
+    """
+    One fixed-effort multilevel splitting estimate of the collision probability.
+
+    :param kwargs: session settings (see run_to_level)
+    :param levels: decreasing score levels; a final level 0 (an actual collision) is appended
+    :param n_per_stage: number of trajectories run in every stage
+    :param seed: seed of this estimate (a list of ints); trajectory i of stage j uses seed (*seed, j, i)
+    :param backend: job backend that runs the trajectories of a stage
+    :return: dictionary with the 'estimate', the conditional probability of every stage
+        ('stage_probabilities') and the number of simulated 'ticks'
+    """
+    resample_rng = make_streams(seed, 1)[0]
+    starts = [None] * n_per_stage
+    stage_probabilities = []
+    ticks = 0
+
+    for stage, level in enumerate(list(levels) + [0]):
+        tasks = [{"kwargs": kwargs, "seed": [*seed, stage, i], "level": level, "start": start}
+                 for i, start in enumerate(starts)]
+        outcomes = list(backend.map(run_to_level, tasks))
+        ticks += sum(outcome["ticks"] for outcome in outcomes)
+
+        entries = [outcome["state"] for outcome in outcomes if outcome["reached"]]
+        stage_probabilities.append(len(entries) / n_per_stage)
+        if not entries:
+            stage_probabilities += [0.0] * (len(levels) - stage)
+            break
+        # clones of the next stage start from entry states drawn uniformly with replacement
+        starts = [entries[k] for k in resample_rng.randint(len(entries), size=n_per_stage)]
+
+    return {"estimate": float(np.prod(stage_probabilities)), "stage_probabilities": stage_probabilities, "ticks": ticks}
+
+def run_splitting(
+        number_of_repeats=10,
+        levels=SPLITTING_LEVELS,
+        n_per_stage=100,
+        mode=None,
+        spot_level=None,
+        rule_type=None,
+        num_surfer=None,
+        ratio=None,
+        spot_conf=None,
+        duration=None,
+        seed=None,
+        confidence=0.95,
+        backend=None,
+):
+    """
+    Estimate the probability of at least one collision per session by multilevel splitting.
+
+    The splitting estimate is repeated number_of_repeats times with independent seeds
+    (seed, r); the repeats are unbiased and independent, so their mean gets a normal
+    confidence interval.
+
+    :param levels: decreasing collision-score levels (m) between 'far apart' and a collision
+    :param n_per_stage: number of trajectories run in every stage of every repeat
+    :param confidence: confidence level of the reported interval
+    :param backend: job backend from src.executors that runs the trajectories
+    :return: (per-repeat rows, summary dictionary with 'estimate', 'std_error', 'ci_low',
+        'ci_high', mean 'stage_probabilities' and total simulated 'ticks')
+    """
+    if mode is None: mode=EXPR_CONF["mode"]
+    if spot_level is None: spot_level=SPOT_LEVEL
+    if rule_type is None: rule_type=RULE_TYPE
+    if spot_conf is None: spot_conf=SPOT_CONF[spot_level]
+    if duration is None: duration=SESSION_DURATION
+    if seed is None: seed = np.random.SeedSequence().entropy
+    if backend is None: backend = SerialBackend()
+    if list(levels) != sorted(levels, reverse=True) or min(levels, default=1) <= 0:
+        raise ValueError("levels must be positive and decreasing")
+
+    kwargs = {
+        "mode": mode,
+        "spot_level": spot_level,
+        "rule_type": rule_type,
+        "num_surfer": num_surfer,
+        "ratio": ratio if mode == "experiment" else None,
+        "spot_conf": spot_conf,
+        "duration": duration,
+    }
+
+    print(f" Running {number_of_repeats} splitting estimates with {n_per_stage} trajectories per stage...")
+
+    results = [splitting_estimate(kwargs, levels, n_per_stage, [seed, r], backend) for r in range(number_of_repeats)]
+
+    estimates = np.array([row["estimate"] for row in results])
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    std_error = estimates.std(ddof=1) / np.sqrt(len(estimates)) if len(estimates) > 1 else np.nan
+    summary = {
+        "estimate": float(estimates.mean()),
+        "std_error": float(std_error),
+        "ci_low": float(estimates.mean() - z * std_error),
+        "ci_high": float(estimates.mean() + z * std_error),
+        "stage_probabilities": np.mean([row["stage_probabilities"] for row in results], axis=0).tolist(),
+        "ticks": sum(row["ticks"] for row in results),
+    }
+    return results, summary
@@ -1,7 +1,96 @@
 from src.config import *
+from src.rules import get_rule, permitted_pairs
 import numpy as np
 from collections import Counter
 
+def normalized_height(wave_height):
+    """
+    Normalize wave height to [0, 1] using the NORMALIZATION bounds.
+
+    :param wave_height: wave height(s) in meters
+    :return: the normalized height(s)
+    >>> float(normalized_height(1.75))
+    0.5
+    """
+    h_min = NORMALIZATION["wave_height"]["min"]
+    h_max = NORMALIZATION["wave_height"]["max"]
+    return np.clip((np.asarray(wave_height) - h_min) / (h_max - h_min), 0, 1)
+
+# Array versions of the probability models, used by the beach engine. The Surfer methods
+# keep the same formulas on plain floats, which is much faster for one surfer at a time.
+def attempt_probability(skill, wave_height):
+    """
+    Returns the probability that a surfer attempts the wave.
+
+    Idea:
+    - High waves → skilled surfers attempt more, beginners attempt less.
+    - Low waves → beginners attempt more, skilled surfers still have some interest.
+
+    Model:
+    1. Normalize wave height to [0, 1].
+    2. Compute "comfort" = how well the wave height matched the surfer's skill
+    3. Map comfort to probability between 0.1 and 0.9
+
+    :param skill: skill level(s) of the surfer(s)
+    :param wave_height: Height of the incoming wave
+    :return: probability between 0.1 and 0.9
+    """
+    # Normalize wave height to match skill scale (not capped at 1, so very high waves lower comfort)
+    h_min = NORMALIZATION["wave_height"]["min"]
+    h_max = NORMALIZATION["wave_height"]["max"]
+    h = np.maximum(0, (np.asarray(wave_height) - h_min) / (h_max - h_min))
+
+    # Compute comfort representing the similarity between skill and wave height
+    comfort = np.maximum(0, 1 - np.abs(h - skill))
+
+    # higher skill, often higher attempt rate
+    baseline_interest = 0.2 * np.asarray(skill)
+
+    factor = 0.7 * comfort + 0.3 * baseline_interest  # AI logic check - 1
+
+    # Map comfort to attempt rate between 0.1 and 0.9
+    attempt_rate = ATTEMPT_RATE_MIN + (ATTEMPT_RATE_MAX - ATTEMPT_RATE_MIN) * factor
+    return np.clip(attempt_rate, 0, 1)
+
+def success_probability(skill, wave_height, alpha_success=ALPHA_SUCCESS):
+    """
+    Returns the probability that a surfer successfully catches a wave and pop up.
+
+    Idea:
+    Higher waves reduce success rates, but skilled surfers are less sensitive to wave height.
+
+    :param skill: skill level(s) of the surfer(s)
+    :param wave_height: Height of the incoming wave
+    :param alpha_success: impact of wave height on success probability
+    :return: probability between 0.0 and 1.0
+    """
+    # Convert wave height to [0, 1] to measure its impact on a surfer
+    h = normalized_height(wave_height)
+
+    skill = np.asarray(skill)
+    skill_factor = 1 - skill # higher skill, lower sensitivity to wave height
+
+    return np.clip(skill * (1 - alpha_success * h * skill_factor), 0, 1)  # AI logic check - 2
+
+def wipeout_probability(skill, wave_height):
+    """
+    Returns the probability that a surfer wipes out while riding a wave.
+
+    Idea:
+    Higher waves increase the probability of wiping out, but skilled surfers are less sensitive to wave height.
+
+    :param skill: skill level(s) of the surfer(s)
+    :param wave_height: Height of the incoming wave
+    :return: probability between 0.01 and 0.7
+    """
+    # Normalize wave height to [0, 1]
+    h = normalized_height(wave_height)
+
+    base = 0.05 + 0.3 * h                    # higher wave, higher wipe out base rate
+    skill_factor = 1 - np.asarray(skill)     # higher skill, less wipe out rate
+
+    return np.clip(base * skill_factor, 0.01, 0.7)
+
 class Surfer:
     """
     Represents a single surfer with distinct skill levels and behaviors.
@@ -14,21 +103,32 @@ class Surfer:
         bp (float): "Best Position" (Ideal X-coordinate) to take off based on skill.
         state (str): Current state. One of ['waiting', 'paddling', 'surfing', 'wipeout'].
         stats (Counter): Tracks simulation metrics (success count, collisions, etc.).
+        rng (RandomState): Random stream used for this surfer's placement and decisions.
+        alpha_success (float): Impact of wave height on success probability (0 to 1).
+        metrics (MetricsAccumulator): Optional accumulator notified of state changes and events.
     """
     PADDLE_SPEED_SKILL_COEFF = 0.1
     PADDLE_SPEED_BASE = 0.8
 
     all_surfers = [] # automatically track all surfers
 
-    def __init__(self, skill, distance_on_wave=0.0):
+    def __init__(self, skill, distance_on_wave=0.0, rng=None, alpha_success=ALPHA_SUCCESS, metrics=None):
         self.skill = skill
+        self.alpha_success = alpha_success
+        # a private stream keeps this surfer's draws aligned across paired runs
+        self.rng = np.random if rng is None else rng
 
-        self.y = np.random.uniform(OCEAN_Y_MIN, OCEAN_Y_MAX)
+        self.y = self.rng.uniform(OCEAN_Y_MIN, OCEAN_Y_MAX)
         self.x = self.initial_x()
         self.speed = self.PADDLE_SPEED_BASE + skill * self.PADDLE_SPEED_SKILL_COEFF
         self.bp = BP_X_MIN + self.skill * (BP_X_MAX - BP_X_MIN)
 
-        self.state = self.initial_state()
+        self._state = self.initial_state()
+
+        # report events to a MetricsAccumulator, if any
+        self.metrics = metrics
+        if metrics is not None:
+            self.metrics_index = metrics.register(self._state)
 
         self.stats = Counter()
 
@@ -40,6 +140,52 @@ class Surfer:
 
         Surfer.all_surfers.append(self)
 
+    @classmethod
+    def restore(cls, skill, x, y, state, curr_riding_wave=None, distance_on_wave=0.0, ride_already_counted=False,
+                last_catch_time=None, rng=None, alpha_success=ALPHA_SUCCESS, metrics=None):
+        """
+        Recreate a surfer at a given position and state (e.g. from a session snapshot), with fresh stats.
+
+        Unlike __init__, no random draws are made for placement.
+
+        :return: the new Surfer, appended to Surfer.all_surfers
+        """
+        surfer = cls.__new__(cls)
+        surfer.skill = skill
+        surfer.alpha_success = alpha_success
+        surfer.rng = np.random if rng is None else rng
+
+        surfer.x = x
+        surfer.y = y
+        surfer.speed = cls.PADDLE_SPEED_BASE + skill * cls.PADDLE_SPEED_SKILL_COEFF
+        surfer.bp = BP_X_MIN + skill * (BP_X_MAX - BP_X_MIN)
+
+        surfer._state = state
+        surfer.metrics = metrics
+        if metrics is not None:
+            surfer.metrics_index = metrics.register(state)
+
+        surfer.stats = Counter()
+
+        surfer.curr_riding_wave = curr_riding_wave
+        surfer.distance_on_wave = distance_on_wave
+        surfer.ride_already_counted = ride_already_counted
+        surfer.last_catch_time = last_catch_time
+        surfer.waiting_time_sum = 0
+
+        cls.all_surfers.append(surfer)
+        return surfer
+
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, new_state):
+        if self.metrics is not None:
+            self.metrics.on_transition(self._state, new_state)
+        self._state = new_state
+
     # AI idea check - 2
     def initial_x(self):
         """
@@ -47,7 +193,7 @@ class Surfer:
         :return: float, the initial x coordinate
         """
         loc = np.interp(self.skill, [0, 1], [LINEUP_X_NEAR_SHORE, LINEUP_X_OUTSIDE])
-        return max(0, np.random.normal(loc=loc, scale=5))
+        return max(0, self.rng.normal(loc=loc, scale=5))
 
     def initial_state(self):
         if abs(self.x - self.bp) <= CATCH_WAVE_THRESHOLD:
@@ -91,16 +237,7 @@ class Surfer:
 
     def prob_attempt(self, wave_height):
         """
-        Returns the probability that a surfer attempts the wave.
-
-        Idea:
-        - High waves → skilled surfers attempt more, beginners attempt less.
-        - Low waves → beginners attempt more, skilled surfers still have some interest.
-
-        Model:
-        1. Normalize wave height to [0, 1].
-        2. Compute "comfort" = how well the wave height matched the surfer's skill
-        3. Map comfort to probability between 0.1 and 0.9
+        Returns the probability that a surfer attempts the wave (see attempt_probability).
 
         :param wave_height: Height of the incoming wave
         :return: float, a probability between 0.1 and 0.9
@@ -125,10 +262,7 @@ class Surfer:
 
     def prob_success(self, wave_height):
         """
-        Returns the probability that a surfer successfully catches a wave and pop up.
-
-        Idea:
-        Higher waves reduce success rates, but skilled surfers are less sensitive to wave height.
+        Returns the probability that a surfer successfully catches a wave and pop up (see success_probability).
 
         :param wave_height: Height of the incoming wave
         :return: float, a probability between 0.0 and 1.0
@@ -142,19 +276,15 @@ class Surfer:
 
         skill_factor = 1 - self.skill # higher skill, lower sensitivity to wave height
 
-        return min(1, max(0, self.skill * (1 - ALPHA_SUCCESS * h * skill_factor)))  # AI logic check - 2
+        return min(1, max(0, self.skill * (1 - self.alpha_success * h * skill_factor)))  # AI logic check - 2
 
     def prob_wipeout(self, wave_height):
         """
-        Returns the probability that a surfer wipes out while riding a wave.
-
-        Idea:
-        Higher waves increase the probability of wiping out, but skilled surfers are less sensitive to wave height.
+        Returns the probability that a surfer wipes out while riding a wave (see wipeout_probability).
 
         :param wave_height: Height of the incoming wave
         :return: float, a probability between 0.01 and 0.7
         """
-
         h_min = NORMALIZATION["wave_height"]["min"]
         h_max = NORMALIZATION["wave_height"]["max"]
 
@@ -168,22 +298,28 @@ class Surfer:
         p = base * skill_factor
         return min(0.7, max(0.01, p))
 
-    def update_waiting_state(self, rule_type, active_waves):
-        for wave in active_waves:
-            if rule_type == "safe_distance":
-                if any(abs(self.y - oy) <= SAFE_DISTANCE for oy in wave.occupied_y):
-                    continue
-            if abs(wave.x - self.x) <= CATCH_WAVE_THRESHOLD:
-                attempt = np.random.rand() < self.prob_attempt(wave.height)
-                if attempt:
-                    stood_up = np.random.rand() < self.prob_success(wave.height)
-                    if stood_up:
-                        self.state = 'surfing'
-                        self.curr_riding_wave = wave
-                        self.distance_on_wave = 0
-                        self.ride_already_counted = False
-                        wave.occupied_y.append(self.y)
-                        break
+    def update_waiting_state(self, permitted_waves, rule=None):
+        """
+        Attempt the waves the lineup rule permits this surfer, in order, until one is caught.
+
+        :param permitted_waves: waves within reach that the rule lets this surfer go for
+        :param rule: the Rule, asked again about riders who caught a wave earlier in this tick
+        :return: None
+        """
+        for wave in permitted_waves:
+            if rule is not None and rule.yields(self.y, wave.occupied_y):
+                continue
+            attempt = self.rng.rand() < self.prob_attempt(wave.height)
+            if attempt:
+                stood_up = self.rng.rand() < self.prob_success(wave.height)
+                if stood_up:
+                    self.state = 'surfing'
+                    self.curr_riding_wave = wave
+                    self.distance_on_wave = 0
+                    self.ride_already_counted = False
+                    wave.occupied_y.append(self.y)
+                    break
+
     def update_paddling_state(self):
         if self.x > self.bp:
             self.x -= self.speed
@@ -208,11 +344,15 @@ class Surfer:
         # check collision by comparing positions with other surfers
         elif self.check_collisions():
             self.stats['collisions'] += 1
+            if self.metrics is not None:
+                self.metrics.on_collision(self.metrics_index)
             self.state = 'wipeout'
             return
         # check wipeout probability
-        elif np.random.rand() < self.prob_wipeout(self.curr_riding_wave.height):
+        elif self.rng.rand() < self.prob_wipeout(self.curr_riding_wave.height):
             self.stats['wipeout'] += 1
+            if self.metrics is not None:
+                self.metrics.on_wipeout(self.metrics_index)
             self.state = 'wipeout'
             return
         # if none of the above events occur, update ride distance
@@ -221,12 +361,17 @@ class Surfer:
             self.stats['success'] += 1
             self.ride_already_counted = True
 
+            waiting_time = None
             if self.last_catch_time is None:
                 self.last_catch_time = current_time
             else:
-                self.waiting_time_sum += current_time - self.last_catch_time
+                waiting_time = current_time - self.last_catch_time
+                self.waiting_time_sum += waiting_time
                 self.last_catch_time = current_time
 
+            if self.metrics is not None:
+                self.metrics.on_success(self.metrics_index, waiting_time)
+
     def update_wipeout_state(self):
         # move all the way toward the shore during a wipeout
         if self.curr_riding_wave:
@@ -238,16 +383,16 @@ class Surfer:
             self.curr_riding_wave = None
             self.ride_already_counted = False
 
-    def update_state_and_position(self, rule_type, active_waves, current_time):
+    def update_state_and_position(self, permitted_waves, current_time, rule=None):
         """
         Updates the state and position of the surfer based on their current state.
-        :param rule_type: free-for-all or safe-distance-rule, affecting the updating rules
-        :param active_waves: currently active waves in the session
+        :param permitted_waves: waves this surfer may attempt if waiting (see permitted_waves)
         :param current_time: current time
+        :param rule: the lineup Rule (see update_waiting_state)
         :return: None
         """
         if self.state == 'waiting':
-            self.update_waiting_state(rule_type, active_waves)
+            self.update_waiting_state(permitted_waves, rule)
         elif self.state == 'paddling':
             self.update_paddling_state()
         elif self.state == 'surfing':
@@ -255,8 +400,39 @@ class Surfer:
         elif self.state == 'wipeout':
             self.update_wipeout_state()
 
+    @classmethod
+    def permitted_waves(cls, rule_type, active_waves):
+        """
+        Ask the lineup rule (see src.rules) which waves every waiting surfer may attempt this tick.
+
+        :param rule_type: a rule name or Rule
+        :param active_waves: currently active waves in the session
+        :return: dictionary mapping each permitted surfer to its waves, in active_waves order
+        """
+        waiting = [s for s in cls.all_surfers if s.state == 'waiting']
+        if not waiting or not active_waves:
+            get_rule(rule_type)
+            return {}
+
+        surfer, wave = permitted_pairs(
+            rule_type,
+            x=[s.x for s in waiting],
+            y=[s.y for s in waiting],
+            wave_x=[w.x for w in active_waves],
+            rider_wave=[k for k, w in enumerate(active_waves) for _ in w.occupied_y],
+            rider_y=[y for w in active_waves for y in w.occupied_y],
+            queue_time=[np.nan if s.last_catch_time is None else s.last_catch_time for s in waiting],
+        )
+
+        permitted = {}
+        for i, k in zip(surfer.tolist(), wave.tolist()):
+            permitted.setdefault(waiting[i], []).append(k)
+        return {s: [active_waves[k] for k in sorted(ks)] for s, ks in permitted.items()}
+
     @classmethod
     # Update all surfers
     def update_all(cls, rule_type, active_waves, current_time):
+        rule = get_rule(rule_type)
+        permitted = cls.permitted_waves(rule, active_waves)
         for surfer in list(cls.all_surfers):
-            surfer.update_state_and_position(rule_type, active_waves, current_time)
\ No newline at end of file
+            surfer.update_state_and_position(permitted.get(surfer, ()), current_time, rule)
@@ -0,0 +1,144 @@
+"""
+Shared bank of pre-generated wave schedules.
+
+A bank stores many wave schedules of one spot configuration and duration in a single
+flat file: a JSON header, then the columns offsets (int64, one more than the number of
+schedules), spawn_time, height and speed (float64, one entry per wave). Schedule i is
+rows offsets[i]:offsets[i + 1] of the wave columns.
+
+Readers memory-map the file, so every worker shares the same pages and reading a
+schedule copies nothing. Schedule i is generated from seed (seed, i), which makes a
+bank an exactly reproducible wave climate across experiments.
+"""
+import functools
+import json
+import os
+import shutil
+import tempfile
+
+from src.simulation import *
+
+HEADER_SIZE = 4096
+WAVE_COLUMNS = ["spawn_time", "height", "speed"]
+
+class WaveBank:
+    """
+    Read-only, memory-mapped view of a wave bank file.
+
+    Attributes:
+        path (str): Location of the bank file.
+        spot_conf (dict): Spot configuration the schedules were drawn from.
+        duration (int): Session duration of every schedule (sec).
+        seed (int): Base seed of the bank.
+        offsets (memmap): Start row of every schedule, plus the total row count.
+        spawn_time, height, speed (memmap): Wave columns.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = json.loads(f.read(HEADER_SIZE).rstrip(b"\0 "))
+
+        self.spot_conf = header["spot_conf"]
+        self.duration = header["duration"]
+        self.seed = header["seed"]
+        n_schedules = header["n_schedules"]
+        n_waves = header["n_waves"]
+
+        self.offsets = np.memmap(path, dtype=np.int64, mode="r", offset=HEADER_SIZE, shape=(n_schedules + 1,))
+        position = HEADER_SIZE + self.offsets.nbytes
+        for column in WAVE_COLUMNS:
+            setattr(self, column, np.memmap(path, dtype=np.float64, mode="r", offset=position, shape=(n_waves,)) if n_waves else np.zeros(0))
+            position += 8 * n_waves
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __reduce__(self):
+        # ship only the path; the receiving process maps the file itself
+        return (open_bank, (self.path,))
+
+    def schedule(self, index):
+        """
+        Return schedule index as zero-copy column views.
+
+        :param index: schedule number
+        :return: tuple of arrays (spawn_time, height, speed)
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f"wave bank has {len(self)} schedules, no index {index}")
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        return self.spawn_time[start:stop], self.height[start:stop], self.speed[start:stop]
+
+    def wave_schedule(self, index):
+        """
+        Return schedule index in the list-of-dict format of simulate_waves.
+
+        :param index: schedule number
+        :return: a list of wave dictionaries
+        """
+        return [{'spawn_time': float(t), 'height': float(h), 'speed': float(s), 'spawned': False}
+                for t, h, s in zip(*self.schedule(index))]
+
+@functools.lru_cache(maxsize=8)
+def open_bank(path):
+    """
+    Open (and keep open) the wave bank at path, so repeated tasks in a worker map it once.
+
+    :param path: location of the bank file
+    :return: a WaveBank
+    """
+    return WaveBank(path)
+
+def build_bank(path, spot_conf, duration, n_schedules, seed=0):
+    """
+    Generate n_schedules wave schedules with simulate_waves and write them as a bank file.
+
+    :param path: location of the bank file to create (replaced if it exists)
+    :param spot_conf: dictionary containing spot configuration
+    :param duration: the total duration of every schedule (sec)
+    :param n_schedules: number of schedules
+    :param seed: base seed; schedule i is drawn from seed (seed, i)
+    :return: the opened WaveBank
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "beginner.bank")
+    >>> bank = build_bank(path, SPOT_CONF["beginner"], 300, 4, seed=1)
+    >>> len(bank), bank.duration
+    (4, 300)
+    >>> bank.wave_schedule(2) == simulate_waves(300, SPOT_CONF["beginner"], rng=make_streams([1, 2], 1)[0])
+    True
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    offsets = [0]
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        columns = {column: open(os.path.join(tmp, column), "wb") for column in WAVE_COLUMNS}
+        try:
+            for i in range(n_schedules):
+                schedule = simulate_waves(duration, spot_conf, rng=make_streams([seed, i], 1)[0])
+                for column in WAVE_COLUMNS:
+                    columns[column].write(np.array([w[column] for w in schedule], dtype=np.float64).tobytes())
+                offsets.append(offsets[-1] + len(schedule))
+        finally:
+            for f in columns.values():
+                f.close()
+
+        header = json.dumps({
+            "spot_conf": spot_conf,
+            "duration": duration,
+            "seed": seed,
+            "n_schedules": n_schedules,
+            "n_waves": offsets[-1],
+        }).encode()
+        if len(header) > HEADER_SIZE:
+            raise ValueError("spot_conf is too large for the bank header")
+
+        staging = os.path.join(tmp, "bank")
+        with open(staging, "wb") as out:
+            out.write(header.ljust(HEADER_SIZE, b" "))
+            out.write(np.array(offsets, dtype=np.int64).tobytes())
+            for column in WAVE_COLUMNS:
+                with open(os.path.join(tmp, column), "rb") as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(staging, path)
+
+    open_bank.cache_clear()
+    return open_bank(path)
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from src.beach import WAITING, SurferPool, catch_waves, neighbor_pairs, run_beach
+from src.config import BEACH_CONF, SAFE_DISTANCE
+from src.surfer import Surfer, attempt_probability, success_probability, wipeout_probability
+
+@pytest.fixture
+def small_beach():
+    return dict(BEACH_CONF, arrival_rate=2.0, mean_stay=30, capacity=120)
+
+def test_neighbor_pairs_brute_force():
+    rng = np.random.RandomState(0)
+    qx, qy = rng.uniform(0, 50, 40), rng.uniform(-50, 50, 40)
+    px, py = rng.uniform(0, 50, 300), rng.uniform(-50, 50, 300)
+
+    q_idx, p_idx = neighbor_pairs(qx, qy, px, py, 3)
+
+    dist2 = (qx[:, None] - px[None, :]) ** 2 + (qy[:, None] - py[None, :]) ** 2
+    expected = set(zip(*np.nonzero(dist2 < 9)))
+    assert set(zip(q_idx.tolist(), p_idx.tolist())) == expected
+
+def test_array_probabilities_match_surfer_methods():
+    skills, heights = np.linspace(0, 1, 11), np.linspace(0, 4, 17)
+    for skill in skills:
+        surfer = Surfer.__new__(Surfer)
+        surfer.skill, surfer.alpha_success = skill, 0.7
+        assert attempt_probability(skill, heights) == pytest.approx([surfer.prob_attempt(h) for h in heights])
+        assert success_probability(skill, heights, 0.7) == pytest.approx([surfer.prob_success(h) for h in heights])
+        assert wipeout_probability(skill, heights) == pytest.approx([surfer.prob_wipeout(h) for h in heights])
+
+class AlwaysGoes:
+    def rand(self, n):
+        return np.zeros(n)
+
+@pytest.mark.parametrize("rule_type, caught", [("free_for_all", [0, 1, 2]), ("safe_distance", [0, 2])])
+def test_catch_waves_resolves_surfers_of_the_same_tick(rule_type, caught):
+    # three surfers in reach of one wave; the first two are closer than SAFE_DISTANCE along the beach
+    pool = SurferPool(3)
+    waiting = pool.acquire(3)
+    pool.skill[:], pool.x[:], pool.y[:] = 0.9, 50.0, [0.0, SAFE_DISTANCE / 2, 3 * SAFE_DISTANCE]
+    pool.state[:] = WAITING
+    waves = {"id": np.array([7]), "x": np.array([50.0]), "height": np.array([1.0]), "speed": np.array([3.0])}
+    occupied = {}
+
+    catch_waves(pool, waiting, waves, occupied, rule_type, AlwaysGoes(), 1.0)
+
+    assert np.flatnonzero(pool.wave_id == 7).tolist() == caught
+    assert [y for y, _ in occupied[7]] == pool.y[caught].tolist()
+
+def test_surfer_pool_reuses_slots():
+    pool = SurferPool(4)
+    x = pool.x
+
+    slots = pool.acquire(4)
+    pool.release(slots[:2])
+
+    assert len(pool) == 2
+    assert sorted(pool.acquire(3).tolist()) == sorted(slots[:2].tolist())
+    assert pool.x is x
+
+# test function run_beach()
+def test_run_beach(small_beach):
+    table = run_beach(beach_conf=small_beach, duration=120, initial_surfers=60, seed=3)
+    peaks = table.drop(index="beach")
+
+    assert len(peaks) == len(small_beach["peaks"])
+    assert table.loc["beach", "n_surfers"] == peaks["n_surfers"].sum()
+    assert table.loc["beach", "n_surfers"] > 60   # arrivals joined during the session
+    assert (table["avg_collision_count"] >= 0).all()
+
+def test_run_beach_capacity(small_beach):
+    table = run_beach(beach_conf=dict(small_beach, capacity=10), duration=60, initial_surfers=50, seed=3)
+
+    assert table.loc["beach", "turned_away"] >= 40
+
+def test_run_beach_seeded(small_beach):
+    first = run_beach(beach_conf=small_beach, duration=60, seed=8)
+    second = run_beach(beach_conf=small_beach, duration=60, seed=8)
+
+    assert first.equals(second)
@@ -0,0 +1,56 @@
+import json
+import numpy as np
+import os
+from src.burnin import (burn_in, load_snapshot, restore_session, save_snapshot, snapshot_session, snapshot_to_lists,
+                        run_forked, run_many_forked)
+from src.executors import FileQueueBackend, ProcessPoolBackend
+from src.surfer import Surfer
+from src.wave import Wave
+
+def test_snapshot_round_trip():
+    snapshot = burn_in(spot_level="mixed", num_surfer=30, duration=300, seed=4)
+    restore_session(snapshot_to_lists(snapshot))
+    restored = snapshot_session(300)
+
+    for key, value in snapshot.items():
+        if key != "surfer_last_catch_time":
+            assert np.array_equal(value, restored[key]), key
+    assert np.allclose(restored["surfer_last_catch_time"], snapshot["surfer_last_catch_time"] - 300, equal_nan=True)
+
+    # surfers sharing a wave share the restored Wave object
+    riders = [s for s in Surfer.all_surfers if s.curr_riding_wave is not None]
+    assert all(any(s.curr_riding_wave is w for w in Wave.all_waves) or s.state == "wipeout" for s in riders)
+
+def test_forks_are_reproducible_and_independent():
+    snapshot = burn_in(spot_level="mixed", num_surfer=30, duration=300, seed=4)
+    a = run_forked(snapshot, spot_level="mixed", duration=200, seed=[1, 0])
+    b = run_forked(snapshot, spot_level="mixed", duration=200, seed=[1, 0])
+    c = run_forked(snapshot, spot_level="mixed", duration=200, seed=[1, 1])
+
+    assert a == b
+    assert a != c
+    assert a["n_surfers"] == 30
+
+def test_saved_snapshot_forks_like_the_original(tmp_path):
+    snapshot = burn_in(spot_level="mixed", num_surfer=30, duration=300, seed=4)
+    loaded = load_snapshot(save_snapshot(snapshot, str(tmp_path)))
+
+    assert run_forked(loaded, spot_level="mixed", duration=200, seed=[1, 0]) == \
+        run_forked(snapshot, spot_level="mixed", duration=200, seed=[1, 0])
+
+def test_run_many_forked_backends_match(tmp_path):
+    kwargs = dict(number_of_runs=4, burn_in_duration=120, mode="realistic", num_surfer=10, duration=100, seed=5)
+    serial, mean, _ = run_many_forked(**kwargs)
+    pooled, _, _ = run_many_forked(**kwargs, backend=ProcessPoolBackend(2))
+    queued, _, _ = run_many_forked(**kwargs, backend=FileQueueBackend(str(tmp_path / "queue"), local_workers=2),
+                                   snapshot_dir=str(tmp_path))
+
+    assert serial == pooled == queued
+    assert len(serial) == 4 and mean["n_surfers"] == 10
+    # the shared snapshot file is removed afterwards
+    assert os.listdir(tmp_path) == ["queue"]
+
+def test_snapshot_is_json_friendly():
+    snapshot = snapshot_to_lists(burn_in(num_surfer=5, duration=60, seed=2))
+    text = json.dumps(snapshot)
+    assert json.dumps(json.loads(text)) == text
@@ -0,0 +1,92 @@
+import os
+import time
+import numpy as np
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from src.executors import SerialBackend, ProcessPoolBackend, FileQueueBackend
+from src.simulation import run_many
+
+def fail_once(task):
+    # the marker file makes the first attempt of every task fail
+    marker, value = task
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        raise RuntimeError("worker lost")
+    return value * 2
+
+def crash_once(task):
+    # the first attempt of a task without marker kills its worker process outright
+    marker, value = task
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return value * 2
+
+def stall_once(task):
+    # the first attempt of every task outlives its lease
+    marker, value = task
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        time.sleep(5)
+    return value * 2
+
+def always_fail(task):
+    raise ValueError("bad task")
+
+@pytest.fixture
+def run_kwargs():
+    return dict(number_of_runs=4, mode="realistic", duration=60, num_surfer=5, seed=21)
+
+def test_backends_match_serial_run(run_kwargs, tmp_path):
+    serial, _, _ = run_many(**run_kwargs)
+    pooled, _, _ = run_many(**run_kwargs, backend=ProcessPoolBackend(2, batch_size=3))
+    queued, _, _ = run_many(**run_kwargs, backend=FileQueueBackend(str(tmp_path), local_workers=2, batch_size=3))
+
+    assert serial == pooled == queued
+
+def test_file_queue_accepts_numpy_values(tmp_path):
+    kwargs = dict(number_of_runs=2, mode="realistic", duration=30, seed=5)
+    serial, _, _ = run_many(**kwargs, num_surfer=3)
+    queued, _, _ = run_many(**kwargs, num_surfer=np.int64(3), backend=FileQueueBackend(str(tmp_path), local_workers=1))
+
+    assert serial == queued
+
+def test_serial_backend_order():
+    assert list(SerialBackend(batch_size=2).map(abs, [-3, 1, -2])) == [3, 1, 2]
+
+def test_process_pool_retries(tmp_path):
+    tasks = [(str(tmp_path / f"marker-{i}"), i) for i in range(3)]
+
+    assert list(ProcessPoolBackend(2, retries=1).map(fail_once, tasks)) == [0, 2, 4]
+
+def test_process_pool_survives_worker_crashes(tmp_path):
+    tasks = [(str(tmp_path / f"marker-{i}"), i) for i in range(4)]
+    for marker, value in tasks[1::2]:
+        open(marker, "w").close()   # tasks 0 and 2 crash their worker once
+
+    # broken pools are not charged to the batches that happened to run in them
+    assert list(ProcessPoolBackend(2, retries=0).map(crash_once, tasks)) == [0, 2, 4, 6]
+
+def test_process_pool_gives_up_after_max_restarts():
+    with pytest.raises(BrokenProcessPool):
+        list(ProcessPoolBackend(2, max_restarts=1).map(os._exit, [1, 1]))
+
+def test_file_queue_retries(tmp_path):
+    tasks = [(str(tmp_path / f"marker-{i}"), i) for i in range(3)]
+    backend = FileQueueBackend(str(tmp_path / "queue"), local_workers=1, batch_size=1, retries=1, poll_interval=0.05)
+
+    assert list(backend.map(fail_once, tasks)) == [0, 2, 4]
+
+def test_file_queue_requeues_expired_leases(tmp_path):
+    tasks = [(str(tmp_path / "marker-0"), 0)]
+    backend = FileQueueBackend(str(tmp_path / "queue"), local_workers=2, batch_size=1, lease=0.5, poll_interval=0.05)
+
+    start = time.time()
+    assert list(backend.map(stall_once, tasks)) == [0]
+    assert time.time() - start < 4
+
+def test_file_queue_gives_up(tmp_path):
+    backend = FileQueueBackend(str(tmp_path), local_workers=1, retries=1, poll_interval=0.05)
+
+    with pytest.raises(RuntimeError, match="failed 2 times"):
+        list(backend.map(always_fail, [1]))
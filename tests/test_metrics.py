@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from src.metrics import MetricsAccumulator, QuantileSketch, STATES
+from src.simulation import gini, run_simulation
+
+def test_accumulator_events():
+    metrics = MetricsAccumulator(2, sample_interval=10)
+    a = metrics.register('waiting')
+    b = metrics.register('paddling')
+
+    metrics.on_transition('waiting', 'surfing')
+    metrics.on_success(a)
+    metrics.on_success(a, waiting_time=30)
+    metrics.on_collision(b)
+    for t in range(10):
+        metrics.tick(t)
+
+    row = metrics.timeseries().loc[10]
+    assert (row['surfing'], row['paddling'], row['waiting']) == (1, 1, 0)
+    assert row['collisions_per_min'] == 6.0
+    assert metrics.success.tolist() == [2, 0]
+    assert metrics.waiting_time_sum.tolist() == [30, 0]
+
+def test_interval_gini():
+    metrics = MetricsAccumulator(2, sample_interval=10)
+    a, b = metrics.register('waiting'), metrics.register('waiting')
+
+    metrics.on_success(a)
+    metrics.on_success(a)
+    metrics.sample(10)
+    metrics.on_success(a)
+    metrics.on_success(b)
+    metrics.sample(20)
+    metrics.sample(30)
+
+    series = metrics.timeseries()
+    assert series["gini_interval"].tolist() == [gini([2, 0]), 0.0, 0.0]
+    assert series["gini"].tolist() == [gini([2, 0]), gini([3, 1]), gini([3, 1])]
+
+def test_quantile_sketch_accuracy():
+    values = np.random.RandomState(0).exponential(200, size=5000)
+    sketch = QuantileSketch(0.01)
+    for v in values:
+        sketch.add(v)
+
+    for q in (0.1, 0.5, 0.9):
+        assert sketch.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.02)
+
+def test_simulation_timeseries():
+    stats = run_simulation(mode="realistic", duration=300, num_surfer=20, seed=2, timeseries=True)
+    series = stats["timeseries"]
+
+    assert list(series.index) == [60, 120, 180, 240, 300]
+    assert (series[STATES].sum(axis=1) == 20).all()
+    assert series["gini"].iloc[-1] == pytest.approx(stats["fairness"])
+    assert set(stats["waiting_time_quantiles"]) == {0.1, 0.25, 0.5, 0.75, 0.9}
+
+def test_register_grows_past_the_initial_size():
+    metrics = MetricsAccumulator(1)
+    indices = [metrics.register('paddling') for _ in range(100)]
+    metrics.on_collision(99)
+    metrics.on_success(50, waiting_time=12.5)
+
+    assert indices == list(range(100))
+    assert len(metrics.success) == len(metrics.collisions) == len(metrics.waiting_time_sum) == 100
+    assert metrics.success.sum() == 1 and metrics.collisions[99] == 1 and metrics.waiting_time_sum[50] == 12.5
+    assert metrics.occupancy['paddling'] == 100
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from src.beach import run_beach
+from src.config import SAFE_DISTANCE
+from src.rules import RULES, Rule, benchmark_rules, candidate_pairs, get_rule, permitted_pairs, register_rule
+from src.simulation import Surfer, Wave, run_simulation
+
+def pairs(surfer, wave):
+    return sorted(zip(surfer.tolist(), wave.tolist()))
+
+def test_unknown_rule_names_are_rejected():
+    for name in ("free-for-all", "safe-distance-rule", None):
+        with pytest.raises(ValueError, match="unknown rule_type"):
+            get_rule(name)
+    with pytest.raises(ValueError, match="unknown rule_type"):
+        run_simulation(duration=10, rule_type="free-for-all")
+    with pytest.raises(ValueError, match="unknown rule_type"):
+        run_beach(duration=10, initial_surfers=5, rule_type="safe-distance-rule")
+
+def test_candidate_pairs_match_brute_force():
+    rng = np.random.RandomState(0)
+    x, wave_x = rng.uniform(0, 100, 300), rng.uniform(0, 100, 12)
+    expected = [(i, k) for i in range(len(x)) for k in range(len(wave_x)) if abs(wave_x[k] - x[i]) <= 2]
+    assert pairs(*candidate_pairs(x, wave_x)) == expected
+
+def test_safe_distance_matches_brute_force():
+    rng = np.random.RandomState(1)
+    x, y = rng.uniform(40, 60, 200), rng.uniform(-50, 50, 200)
+    wave_x = rng.uniform(40, 60, 6)
+    rider_wave, rider_y = rng.randint(6, size=15), rng.uniform(-50, 50, 15)
+
+    expected = [(i, k) for i, k in pairs(*candidate_pairs(x, wave_x))
+                if not any(abs(y[i] - ry) <= SAFE_DISTANCE for rw, ry in zip(rider_wave, rider_y) if rw == k)]
+    assert pairs(*permitted_pairs("safe_distance", x, y, wave_x, rider_wave, rider_y)) == expected
+
+def test_priority_rules():
+    # three surfers in reach of wave 0, one of wave 1; wave 0 already carries a rider at y = 4
+    x = np.array([50.0, 50.5, 51.5, 70.0])
+    y = np.array([-8.0, 2.0, 20.0, 30.0])
+    lineup = dict(x=x, y=y, wave_x=np.array([50.0, 70.0]), rider_wave=np.array([0]), rider_y=np.array([4.0]),
+                  queue_time=np.array([100.0, 40.0, np.nan, 10.0]))
+
+    assert pairs(*permitted_pairs("free_for_all", **lineup)) == [(0, 0), (1, 0), (2, 0), (3, 1)]
+    assert pairs(*permitted_pairs("closest_to_peak", **lineup)) == [(1, 0), (3, 1)]
+    assert pairs(*permitted_pairs("one_surfer_per_wave", **lineup)) == [(3, 1)]
+    assert pairs(*permitted_pairs("rotation_queue", **lineup)) == [(2, 0), (3, 1)]
+
+    # a rider nearer to the peak than every candidate keeps the wave
+    lineup["rider_y"] = np.array([1.0])
+    assert pairs(*permitted_pairs("closest_to_peak", **lineup)) == [(3, 1)]
+
+def test_priority_rules_group_by_peak():
+    # two peaks on one wave: every peak has its own priority
+    lineup = dict(x=np.array([50.0, 50.0, 50.0]), y=np.array([-390.0, -420.0, 3.0]), wave_x=np.array([50.0]),
+                  rider_wave=np.array([0]), rider_y=np.array([-400.0]), peak=np.array([0, 0, 1]),
+                  peak_y=np.array([-400.0, -400.0, 0.0]), rider_peak=np.array([0]))
+    assert pairs(*permitted_pairs("one_surfer_per_wave", **lineup)) == [(2, 0)]
+    assert pairs(*permitted_pairs("closest_to_peak", **lineup)) == [(2, 0)]
+
+class AlwaysGoes:
+    def rand(self):
+        return 0.0
+
+def catchers(rule_type):
+    # three surfers in reach of one wave; the first two are closer than SAFE_DISTANCE along the beach
+    wave = Wave.__new__(Wave)
+    wave.x, wave.height, wave.speed, wave.occupied_y = 50.0, 1.0, 3.0, []
+    Surfer.all_surfers = []
+    surfers = [Surfer.restore(skill=0.9, x=50.0, y=y, state="waiting", rng=AlwaysGoes())
+               for y in (0.0, SAFE_DISTANCE / 2, 3 * SAFE_DISTANCE)]
+    Surfer.update_all(rule_type, [wave], 0)
+    return [surfers.index(s) for s in surfers if s.curr_riding_wave is wave]
+
+def test_safe_distance_sees_riders_of_the_same_tick():
+    assert catchers("free_for_all") == [0, 1, 2]
+    # surfer 1 is permitted at the start of the tick, then backs off once surfer 0 has caught the wave
+    assert catchers("safe_distance") == [0, 2]
+
+@pytest.mark.parametrize("rule_type", sorted(RULES))
+def test_every_rule_runs_in_both_engines(rule_type):
+    res = run_simulation(spot_level="mixed", num_surfer=20, duration=300, seed=1, rule_type=rule_type)
+    assert res["n_surfers"] == 20
+    table = run_beach(rule_type=rule_type, duration=60, initial_surfers=200, seed=1)
+    assert table.loc["beach", "n_surfers"] > 0
+
+def test_custom_rules_plug_in():
+    @register_rule
+    class NobodyGoes(Rule):
+        name = "nobody_goes"
+
+        def allowed(self, candidates):
+            return np.zeros(len(candidates["surfer"]), dtype=bool)
+
+    try:
+        assert run_simulation(num_surfer=20, duration=300, seed=1, rule_type="nobody_goes")["avg_success_count"] == 0
+        with pytest.raises(ValueError, match="already registered"):
+            register_rule(NobodyGoes)
+    finally:
+        del RULES["nobody_goes"]
+
+def test_benchmark_covers_every_rule():
+    timings = benchmark_rules(n_surfers=200, n_waves=5, n_riders=20, repeats=2)
+    assert sorted(timings) == sorted(RULES)
+    assert all(seconds > 0 for seconds, _ in timings.values())
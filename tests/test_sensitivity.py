@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+from src.sensitivity import apply_params, run_sensitivity, saltelli_design, default_ranges
+from src.config import SPOT_CONF
+
+@pytest.fixture
+def ranges():
+    return {"lambda_set": (3.0, 4.0), "skill.alpha": (1.5, 2.5)}
+
+def test_saltelli_design_within_ranges(ranges):
+    design = saltelli_design(ranges, 8, seed=3, block_size=4)
+
+    assert len(design) == 8 * (len(ranges) + 2)
+    for name, (low, high) in ranges.items():
+        assert design[name].between(low, high).all()
+
+def test_saltelli_design_block_size():
+    with pytest.raises(ValueError, match="multiple of block_size"):
+        saltelli_design({"lambda_set": (3.0, 4.0)}, 5, block_size=4)
+
+def test_default_ranges_cover_base():
+    ranges = default_ranges(SPOT_CONF["advanced"])
+
+    for low, high in ranges.values():
+        assert low < high
+
+@pytest.mark.parametrize("spot_level", sorted(SPOT_CONF))
+def test_default_design_keeps_speed_range_ordered(spot_level):
+    ranges = default_ranges(SPOT_CONF[spot_level])
+    design = saltelli_design(ranges, 16, seed=0)
+
+    for record in design[list(ranges)].to_dict("records"):
+        speed = apply_params(SPOT_CONF[spot_level], record)["wave_speed"]
+        assert 0 < speed["min"] <= speed["max"]
+
+# test function run_sensitivity()
+def test_run_sensitivity(ranges, tmp_path):
+    cache_path = tmp_path / "points.jsonl"
+    kwargs = dict(ranges=ranges, spot_level="beginner", mode="realistic", duration=50,
+                  num_surfer=5, cache_path=str(cache_path), max_workers=1, block_size=2)
+
+    design, indices = run_sensitivity(n_base=2, **kwargs)
+
+    assert set(indices) == {"avg_success_count", "avg_collision_count", "avg_waiting_time", "fairness"}
+    assert list(indices["fairness"].index) == list(ranges)
+    assert list(indices["fairness"].columns) == ["S1", "ST"]
+    assert len(cache_path.read_text().splitlines()) == len(design)
+
+    # extending the design only runs the new points
+    bigger, _ = run_sensitivity(n_base=4, **kwargs)
+
+    assert len(cache_path.read_text().splitlines()) == len(bigger)
+    pd.testing.assert_frame_equal(bigger.iloc[:len(design)], design)
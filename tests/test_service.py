@@ -0,0 +1,154 @@
+import asyncio
+import json
+import time
+import pytest
+from src.service import SimulationService
+from src.simulation import run_many
+
+REQUEST = {"mode": "realistic", "num_surfer": 5, "duration": 60, "number_of_runs": 3, "seed": 4}
+
+async def fetch(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    response = await reader.read()
+    writer.close()
+
+    head, _, content = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    if b"chunked" not in head:
+        return status, json.loads(content)
+
+    lines = []
+    while True:
+        size, _, content = content.partition(b"\r\n")
+        if int(size, 16) == 0:
+            return status, lines
+        lines.append(json.loads(content[:int(size, 16)]))
+        content = content[int(size, 16) + 2:]
+
+def serve_and_run(client):
+    async def scenario():
+        service = SimulationService(max_workers=2, cache_size=2)
+        server = await service.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await client(port)
+        finally:
+            server.close()
+            service.close()
+    return asyncio.run(scenario())
+
+def test_service_coalesces_and_caches():
+    async def client(port):
+        first, second = await asyncio.gather(fetch(port, "POST", "/run_many", REQUEST),
+                                             fetch(port, "POST", "/run_many", REQUEST))
+        third = await fetch(port, "POST", "/run_many", REQUEST)
+        stats = await fetch(port, "GET", "/stats")
+        return first, second, third, stats
+
+    first, second, third, (_, stats) = serve_and_run(client)
+
+    assert stats["computed"] == 1
+    assert stats["coalesced"] + stats["cache_hits"] == 2
+    for status, lines in (first, second, third):
+        assert status == 200
+        assert sorted(line["run"] for line in lines[:-1]) == [0, 1, 2]
+        assert "summary" in lines[-1]
+
+    # the streamed rows are the rows of the equivalent seeded run_many
+    expected, _, _ = run_many(number_of_runs=3, mode="realistic", num_surfer=5, duration=60, seed=4)
+    rows = sorted(first[1][:-1], key=lambda line: line.pop("run"))
+    assert rows == pytest.approx(expected)
+
+def test_service_rejects_bad_request():
+    async def client(port):
+        return await fetch(port, "POST", "/run_many", {"spot_level": "reef"})
+
+    status, body = serve_and_run(client)
+
+    assert status == 400
+    assert "reef" in body["error"]
+
+async def send_raw(port, data):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content)
+
+def test_service_rejects_invalid_requests():
+    async def client(port):
+        results = [await fetch(port, "POST", "/run_many", payload)
+                   for payload in ({"mode": "experiment"}, {"num_surfer": "many"}, {"duration": 1.5}, [1, 2],
+                                   {"spot_level": ["x"]}, {"seed": "abc"}, {"seed": -1},
+                                   {"number_of_runs": 10 ** 6}, {"duration": 10 ** 7})]
+        results.append(await send_raw(port, b"GARBAGE\r\n\r\n"))
+        results.append(await send_raw(port, b"POST /run_many HTTP/1.1\r\nContent-Length: x\r\n\r\n"))
+        return results, await fetch(port, "GET", "/stats")
+
+    results, (_, stats) = serve_and_run(client)
+    for status, body in results:
+        assert status == 400
+        assert body["error"]
+    assert "computed" not in stats
+
+def test_failed_replicate_cancels_the_rest(monkeypatch):
+    import src.service as service_module
+    from concurrent.futures import ThreadPoolExecutor
+
+    calls = []
+    def failing_task(task):
+        calls.append(task["seed"])
+        # slow enough that the event loop cancels the queued replicates before the worker reaches them
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+    monkeypatch.setattr(service_module, "run_task", failing_task)
+
+    async def scenario():
+        service = SimulationService(max_workers=1)
+        service.pool.shutdown()
+        service.pool = ThreadPoolExecutor(max_workers=1)
+        computation = service.submit({**REQUEST, "number_of_runs": 20})
+        async for _ in computation.follow():
+            pass
+        service.close()
+        return computation
+
+    computation = asyncio.run(scenario())
+    assert "boom" in computation.error
+    assert len(calls) < 20
+
+def test_replicates_are_submitted_a_few_at_a_time(monkeypatch):
+    import threading
+    import src.service as service_module
+    from concurrent.futures import ThreadPoolExecutor
+
+    active, peak, lock = [0], [0], threading.Lock()
+    def slow_task(task):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return {"fairness": 0.5}
+    monkeypatch.setattr(service_module, "run_task", slow_task)
+
+    async def scenario():
+        service = SimulationService(max_workers=1, max_pending=2)
+        service.pool.shutdown()
+        service.pool = ThreadPoolExecutor(max_workers=8)
+        computation = service.submit({**REQUEST, "number_of_runs": 20})
+        running = len(service.tasks)
+        rows = [row async for row in computation.follow()]
+        await asyncio.sleep(0)
+        service.close()
+        return rows, computation, running, len(service.tasks)
+
+    rows, computation, running, finished = asyncio.run(scenario())
+    assert (running, finished) == (1, 0)
+    assert sorted(row["run"] for row in rows) == list(range(20))
+    assert computation.summary["mean"]["fairness"] == 0.5
+    assert peak[0] <= 2
@@ -1,6 +1,6 @@
 import pandas as pd
 import pytest
-from src.simulation import compute_stats, run_simulation , run_many
+from src.simulation import compute_stats, run_simulation , run_many, run_paired
 
 # test function compute_stats()
 @pytest.fixture(scope="module")
@@ -71,4 +71,34 @@ def test_run_many():
 
     for col in expected_cols:
         assert col in means.index
-        assert col in stds.index
\ No newline at end of file
+        assert col in stds.index
+
+def test_run_many_seeded():
+    _, means_1, _ = run_many(number_of_runs=2, mode="realistic", duration=100, num_surfer=5, seed=11)
+    _, means_2, _ = run_many(number_of_runs=2, mode="realistic", duration=100, num_surfer=5, seed=11)
+
+    assert means_1.equals(means_2)
+
+def test_run_many_reuses_wave_schedule(wave_schedule):
+    results, _, _ = run_many(number_of_runs=2, mode="realistic", duration=100, num_surfer=1, wave_schedule=wave_schedule)
+
+    assert not any(w["spawned"] for w in wave_schedule)
+    assert [r["wave_counts"] for r in results] == [2, 2]
+
+# test function run_paired()
+def test_run_paired_identical_arms():
+    arm = {"rule_type": "safe_distance"}
+    results, summary = run_paired(number_of_runs=3, arm_a=arm, arm_b=arm, seed=5,
+                                  mode="realistic", duration=100, num_surfer=10)
+
+    assert len(results) == 3
+    assert (summary["mean_diff"] == 0).all()
+
+def test_run_paired_shares_population():
+    results, summary = run_paired(number_of_runs=3, seed=5, mode="realistic", duration=100)
+
+    for row in results:
+        assert row["a_n_surfers"] == row["b_n_surfers"]
+        assert row["a_wave_counts"] == row["b_wave_counts"]
+    assert {"mean_diff", "ci_low", "ci_high"} <= set(summary.columns)
+    assert summary.loc["avg_success_count", "ci_low"] <= summary.loc["avg_success_count", "ci_high"]
@@ -0,0 +1,58 @@
+import json
+import numpy as np
+import pytest
+from src.config import SPOT_CONF
+from src.simulation import run_simulation
+from src.splitting import collision_score, run_splitting, run_to_level
+from src.surfer import Surfer
+from src.wave import Wave
+
+KWARGS = dict(mode="realistic", spot_level="advanced", rule_type="free_for_all", num_surfer=4, ratio=None,
+              spot_conf=SPOT_CONF["advanced"], duration=200)
+
+def place(x, y, state, wave=None):
+    surfer = Surfer.restore(skill=0.5, x=x, y=y, state=state, curr_riding_wave=wave)
+    if wave is not None:
+        wave.occupied_y.append(y)
+    return surfer
+
+def test_collision_score_follows_collision_rules():
+    Surfer.all_surfers, Wave.all_waves = [], []
+    a, b = Wave(2.0, 3), Wave(2.0, 3)
+    place(50, 0, 'surfing', a)
+    place(50, -4, 'surfing', b)      # different wave: not compared
+    place(50, 9, 'waiting')          # floater: compared
+    assert collision_score() == pytest.approx(9)
+
+    place(50, 5, 'wipeout', a)       # same wave
+    assert collision_score() == pytest.approx(5)
+
+    Surfer.all_surfers = Surfer.all_surfers[2:]
+    assert collision_score() == float("inf")   # nobody surfing
+
+def test_trajectories_are_reproducible_and_resumable():
+    task = {"kwargs": KWARGS, "seed": [1, 0], "level": 20, "start": None}
+    first = run_to_level(task)
+    assert json.dumps(first) == json.dumps(run_to_level(task))
+
+    hit = next(outcome for outcome in (run_to_level({**task, "seed": [1, i]}) for i in range(50)) if outcome["reached"])
+    clone = run_to_level({**task, "seed": [2, 0], "level": 0, "start": hit["state"]})
+    assert clone["ticks"] <= KWARGS["duration"] - hit["state"]["time"]
+    if clone["reached"]:
+        assert clone["state"]["collided"]
+        assert run_to_level({**task, "level": 0, "start": clone["state"]})["ticks"] == 0
+
+def test_splitting_matches_plain_monte_carlo():
+    settings = {key: KWARGS[key] for key in ("mode", "spot_level", "num_surfer", "duration")}
+    rows, summary = run_splitting(number_of_repeats=4, levels=[10, 6], n_per_stage=40, seed=3, **settings)
+
+    plain = np.mean([run_simulation(**settings, seed=[4, i])["avg_collision_count"] > 0 for i in range(200)])
+    plain_se = np.sqrt(plain * (1 - plain) / 200)
+
+    assert len(rows) == 4 and len(summary["stage_probabilities"]) == 3
+    assert summary["ci_low"] <= summary["estimate"] <= summary["ci_high"]
+    assert abs(summary["estimate"] - plain) < 4 * np.hypot(summary["std_error"], plain_se)
+
+def test_splitting_levels_validation():
+    with pytest.raises(ValueError, match="positive and decreasing"):
+        run_splitting(levels=[5, 10])
@@ -0,0 +1,56 @@
+import pickle
+import numpy as np
+import pytest
+from src.config import SPOT_CONF
+from src.executors import ProcessPoolBackend
+from src.simulation import run_simulation, run_many, run_paired
+from src.wavebank import build_bank
+
+@pytest.fixture
+def bank(tmp_path):
+    return build_bank(str(tmp_path / "mixed.bank"), SPOT_CONF["mixed"], 200, 5, seed=3)
+
+def test_bank_layout(bank):
+    assert len(bank) == 5
+    assert bank.offsets[0] == 0 and bank.offsets[-1] == len(bank.spawn_time)
+    spawn_time, height, speed = bank.schedule(1)
+    assert isinstance(spawn_time, np.memmap)
+    assert (spawn_time < 200).all()
+    assert ((height >= 0.8) & (height <= 2.0)).all()
+
+def test_bank_is_pickled_by_path(bank):
+    assert len(pickle.dumps(bank)) < 1000
+    assert pickle.loads(pickle.dumps(bank)).path == bank.path
+
+def test_simulation_from_bank(bank):
+    from_bank = run_simulation(mode="realistic", num_surfer=10, duration=200, seed=1, wave_bank=bank, wave_index=2)
+    from_list = run_simulation(mode="realistic", num_surfer=10, duration=200, seed=1, wave_schedule=bank.wave_schedule(2))
+
+    assert from_bank == from_list
+
+def test_simulation_bank_validation(bank):
+    with pytest.raises(ValueError, match="either wave_schedule or wave_bank"):
+        run_simulation(wave_schedule=[], wave_bank=bank, wave_index=0)
+    with pytest.raises(ValueError, match="only covers 200 seconds"):
+        run_simulation(duration=300, wave_bank=bank, wave_index=0)
+
+def test_run_many_from_bank(bank):
+    kwargs = dict(number_of_runs=4, mode="realistic", spot_level="mixed", num_surfer=5, duration=100, seed=2, wave_bank=bank.path)
+    serial, _, _ = run_many(**kwargs)
+    pooled, _, _ = run_many(**kwargs, backend=ProcessPoolBackend(2))
+
+    assert serial == pooled
+    # waves of the bank that spawn after the shorter session are not counted
+    assert [row["wave_counts"] for row in serial] == [int((bank.schedule(i)[0] < 100).sum()) for i in range(4)]
+
+def test_run_many_checks_bank_before_running(bank, monkeypatch):
+    calls = []
+    monkeypatch.setattr("src.simulation.run_task", calls.append)
+
+    with pytest.raises(ValueError, match="5 schedules, 6 runs requested"):
+        run_many(number_of_runs=6, spot_level="mixed", duration=100, wave_bank=bank)
+    with pytest.raises(ValueError, match="spot_conf lambda_set differs"):
+        run_many(number_of_runs=2, spot_level="advanced", duration=100, wave_bank=bank.path)
+    with pytest.raises(ValueError, match="only covers 200 seconds"):
+        run_paired(number_of_runs=2, spot_level="mixed", duration=300, wave_bank=bank)
+    assert calls == []